@@ -1,6 +1,8 @@
 import sys
 import os
 
+import pytest
+
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(root_dir)
@@ -32,3 +34,22 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def temporary_settings(tmp_path_factory):
+    # Кэш и метрики тестов не смешиваются с сервером разработки,
+    # превышение бюджета запросов view проваливает тест.
+    from core.test_runner import temporary_settings
+    with temporary_settings(
+            str(tmp_path_factory.mktemp('yatube')), QUERY_BUDGETS='raise'):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(monkeypatch):
+    # Фоновые потоки пишут миниатюры в MEDIA_ROOT, который удаляют
+    # фикстуры после теста.
+    from django.conf import settings
+    monkeypatch.setattr(settings, 'THUMBNAIL_WORKERS', 0)
+
@@ -0,0 +1,144 @@
+import base64
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@override_settings(POSTS_LIMIT=2, COMMENTS_LIMIT=2)
+class ApiViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group)
+            for number in range(3)]
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.user, text=f'Ответ {number}')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get(self, name, data=None, **kwargs):
+        return self.client.get(reverse(f'api:{name}', kwargs=kwargs), data)
+
+    def test_feeds_are_paginated_by_cursor(self):
+        """Все ленты отдают посты страницами по курсору."""
+        feeds = {
+            'index': {},
+            'group_posts': {'slug': 'group'},
+            'profile': {'username': 'author'},
+            'follow_index': {},
+        }
+        for name, kwargs in feeds.items():
+            with self.subTest(name=name):
+                first = self.get(name, **kwargs).json()
+                self.assertEqual(
+                    [post['text'] for post in first['results']],
+                    ['Пост 2', 'Пост 1'])
+                self.assertEqual(first['results'][0]['author'], 'author')
+                second = self.get(
+                    name, {'cursor': first['next']}, **kwargs).json()
+                self.assertEqual(
+                    [post['text'] for post in second['results']], ['Пост 0'])
+                self.assertIsNone(second['next'])
+
+    def test_sparse_fieldsets(self):
+        """?fields= ограничивает поля, неизвестное поле — ошибка 400."""
+        response = self.get('index', {'fields': 'id,comments_count'})
+        self.assertEqual(
+            response.json()['results'][0],
+            {'id': self.posts[2].pk, 'comments_count': 0})
+        response = self.get('index', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_profile_and_post_detail(self):
+        """Профиль содержит счётчики, пост — первую порцию комментариев."""
+        author = self.get('profile', username='author').json()['author']
+        self.assertEqual(author['first_name'], 'Лев')
+        self.assertEqual(author['posts_count'], 3)
+        self.assertEqual(author['followers_count'], 1)
+        data = self.get(
+            'post', username='author', post_id=self.posts[0].pk).json()
+        self.assertEqual(data['post']['comments_count'], 3)
+        self.assertEqual(len(data['comments']['results']), 2)
+        rest = self.get(
+            'post_comments', {'cursor': data['comments']['next']},
+            username='author', post_id=self.posts[0].pk).json()
+        self.assertEqual(
+            [comment['text'] for comment in rest['results']], ['Ответ 0'])
+        response = self.get('post', username='author', post_id=999)
+        self.assertEqual(response.status_code, 404)
+
+    def test_comments_of_missing_post(self):
+        """Комментарии чужого или несуществующего поста — JSON 404."""
+        for username, post_id in (('nobody', self.posts[0].pk),
+                                  ('reader', self.posts[0].pk),
+                                  ('author', 999)):
+            with self.subTest(username=username, post_id=post_id):
+                response = self.get(
+                    'post_comments', username=username, post_id=post_id)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'error': 'Не найдено.'})
+
+    def test_conditional_get(self):
+        """Повторный запрос с ETag получает 304, пока данные не изменились."""
+        response = self.get('profile', username='author')
+        etag = response['ETag']
+        response = self.client.get(
+            reverse('api:profile', kwargs={'username': 'author'}),
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            post=self.posts[1], author=self.user, text='Новый ответ')
+        response = self.client.get(
+            reverse('api:profile', kwargs={'username': 'author'}),
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_group_change_resets_etag(self):
+        """Изменение группы меняет ETag лент, где выводятся её посты."""
+        urls = [
+            reverse('api:index'),
+            reverse('api:follow_index'),
+            reverse('api:profile', kwargs={'username': 'author'}),
+            reverse('api:post', kwargs={
+                'username': 'author', 'post_id': self.posts[0].pk}),
+        ]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        self.group.slug = 'renamed'
+        self.group.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'renamed')
+
+    def test_follow_feed_requires_login(self):
+        """Лента подписок без авторизации отвечает 401."""
+        response = Client().get(reverse('api:follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_cursor_with_wrong_values_shows_first_page(self):
+        """Курсор с неподходящими значениями отдаёт первую страницу."""
+        cursor = base64.urlsafe_b64encode(b'["n","garbage",1]').decode()
+        response = Client().get(reverse('api:index'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), Client().get(reverse('api:index')).json())
+
+    def test_feed_does_not_build_models(self):
+        """Страница ленты выбирается одним запросом."""
+        Client().get(reverse('api:index'))
+        with self.assertNumQueries(1):
+            Client().get(reverse('api:index'), {'cursor': ''})
@@ -0,0 +1,18 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.index, name='index'),
+    path('groups/<slug:slug>/posts/', views.group_posts, name='group_posts'),
+    path('follow/', views.follow_index, name='follow_index'),
+    path('profiles/<str:username>/', views.profile, name='profile'),
+    path(
+        'profiles/<str:username>/posts/<int:post_id>/',
+        views.post_view, name='post'),
+    path(
+        'profiles/<str:username>/posts/<int:post_id>/comments/',
+        views.post_comments, name='post_comments'),
+]
@@ -0,0 +1,179 @@
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_safe
+
+from posts.caching import conditional
+from posts.models import Comment, Group, Post, User
+from posts.paginators import CursorPaginator
+from posts.timeline import follow_feed
+
+# Поле ответа и что выбирать для него в values(). Поля, по которым
+# листает курсор, выбираются всегда, даже если их нет в ?fields=.
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+POST_KEYS = ('pub_date', 'pk')
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+COMMENT_KEYS = ('created', 'pk')
+PROFILE_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def api_view(*scopes, login_required=False):
+    """
+    JSON-ответ из словаря, который возвращает view, с ETag и 304.
+
+    Ошибки 400, 401 и 404 тоже отдаются в JSON.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            try:
+                data = view_func(request, *args, **kwargs)
+            except FieldsError as error:
+                return error_response(str(error), 400)
+            except Http404:
+                return error_response('Не найдено.', 404)
+            return JsonResponse(
+                data, encoder=DjangoJSONEncoder,
+                json_dumps_params={'ensure_ascii': False})
+
+        wrapper = conditional(*scopes)(wrapper)
+
+        @require_safe
+        @wraps(view_func)
+        def checked(request, *args, **kwargs):
+            if login_required and not request.user.is_authenticated:
+                return error_response('Нужна авторизация.', 401)
+            return wrapper(request, *args, **kwargs)
+        return checked
+    return decorator
+
+
+def error_response(message, status):
+    return JsonResponse(
+        {'error': message}, status=status,
+        json_dumps_params={'ensure_ascii': False})
+
+
+def requested_fields(request, available):
+    """Поля из ?fields=a,b в порядке запроса; без параметра — все."""
+    names = request.GET.get('fields')
+    if not names:
+        return available
+    names = names.split(',')
+    unknown = sorted(set(names) - set(available))
+    if unknown:
+        raise FieldsError(f'Неизвестные поля: {", ".join(unknown)}.')
+    return {name: available[name] for name in names}
+
+
+def serialize(row, fields):
+    item = {name: row[lookup] for name, lookup in fields.items()}
+    if 'image' in item:
+        storage = Post._meta.get_field('image').storage
+        item['image'] = storage.url(item['image']) if item['image'] else None
+    return item
+
+
+def rows_page(request, queryset, fields, keys, per_page, **kwargs):
+    """Страница словарей из values() по курсору и ссылки на соседние."""
+    lookups = list(fields.values())
+    lookups += [key for key in keys if key not in lookups]
+    paginator = CursorPaginator(
+        queryset.values(*lookups), per_page, keys=keys, **kwargs)
+    page = paginator.get_cursor_page(request.GET.get('cursor'))
+    return {
+        'results': [serialize(row, fields) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def posts_page(request, queryset, **kwargs):
+    fields = requested_fields(request, POST_FIELDS)
+    return rows_page(
+        request, queryset, fields, POST_KEYS, settings.POSTS_LIMIT, **kwargs)
+
+
+def comments_page(request, post_id, fields=COMMENT_FIELDS):
+    comments = Comment.objects.filter(post_id=post_id)
+    return rows_page(
+        request, comments, fields, COMMENT_KEYS, settings.COMMENTS_LIMIT)
+
+
+def get_row(queryset, fields):
+    row = queryset.values(*fields.values()).first()
+    if row is None:
+        raise Http404
+    return serialize(row, fields)
+
+
+@api_view('index', 'groups')
+def index(request):
+    return posts_page(request, Post.objects.feed())
+
+
+@api_view('group:{slug}', 'groups')
+def group_posts(request, slug):
+    if not Group.objects.filter(slug=slug).exists():
+        raise Http404
+    return posts_page(request, Post.objects.feed().filter(group__slug=slug))
+
+
+@api_view('profile:{username}', 'groups')
+def profile(request, username):
+    author = get_row(
+        User.objects.filter(username=username), PROFILE_FIELDS)
+    for name in ('posts_count', 'followers_count', 'following_count'):
+        author[name] = author[name] or 0
+    posts = Post.objects.feed().filter(author__username=username)
+    return {'author': author, **posts_page(request, posts)}
+
+
+@api_view('index', 'groups', 'profile:{user.username}',
+          login_required=True)
+def follow_index(request):
+    posts, cursor_keys = follow_feed(request.user)
+    return posts_page(request, posts, **cursor_keys)
+
+
+@api_view('profile:{username}', 'groups')
+def post_view(request, username, post_id):
+    fields = requested_fields(request, POST_FIELDS)
+    post = get_row(Post.objects.feed().filter(
+        pk=post_id, author__username=username), fields)
+    return {'post': post, 'comments': comments_page(request, post_id)}
+
+
+@api_view('profile:{username}')
+def post_comments(request, username, post_id):
+    fields = requested_fields(request, COMMENT_FIELDS)
+    if not Post.objects.filter(
+            pk=post_id, author__username=username).exists():
+        raise Http404
+    return comments_page(request, post_id, fields)
@@ -0,0 +1,105 @@
+import os
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+
+from .models import STACKS, ProfileDump, ProfilingTrigger
+from .profiling import signed_flag
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator, который не считает все строки большой таблицы.
+
+    Точно считается не больше limit строк: COUNT(*) по подзапросу
+    с LIMIT. Если строк больше, для выборки без фильтров число оценивается
+    по наибольшему pk (одно чтение индекса), иначе берётся limit.
+    """
+    limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        count = queryset.values('pk')[:self.limit + 1].count()
+        if count <= self.limit:
+            return count
+        if not queryset.query.where:
+            estimate = queryset.aggregate(last=Max('pk'))['last'] or 0
+            return max(estimate, count)
+        return count
+
+
+class ScaledModelAdmin(admin.ModelAdmin):
+    """
+    Настройки админки для таблиц на миллионы строк.
+
+    Общее число записей не показывается, а число найденных оценивается.
+    Для внешних ключей нужно задать list_select_related и
+    autocomplete_fields, чтобы не грузить связанные таблицы целиком.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ProfilingTriggerAdmin(admin.ModelAdmin):
+    list_display = ("url_name", "mode", "remaining", "created", "flag")
+    readonly_fields = ("flag",)
+
+    def flag(self, obj):
+        # Для разового профилирования своего запроса без триггера.
+        if not obj.url_name:
+            return "-"
+        return f"?profile={signed_flag(obj.url_name, obj.mode)}"
+    flag.short_description = "параметр для сотрудников"
+
+
+admin.site.register(ProfilingTrigger, ProfilingTriggerAdmin)
+
+
+class ProfileDumpAdmin(admin.ModelAdmin):
+    list_display = (
+        "created", "mode", "url_name", "path", "duration", "samples",
+        "peak_memory", "retained_memory", "user", "download")
+    list_filter = ("mode", "url_name")
+    list_select_related = ("user",)
+    readonly_fields = [field.name for field in ProfileDump._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        return [
+            path("<int:pk>/download/",
+                 self.admin_site.admin_view(self.download_view),
+                 name="core_profiledump_download"),
+        ] + super().get_urls()
+
+    def download(self, obj):
+        url = reverse("admin:core_profiledump_download", args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, obj.file_name)
+    download.short_description = "файл профиля"
+
+    def download_view(self, request, pk):
+        dump = get_object_or_404(ProfileDump, pk=pk)
+        if not self.has_view_permission(request, dump):
+            raise PermissionDenied
+        file_path = os.path.join(settings.PROFILING_DIR, dump.file_name)
+        if not os.path.exists(file_path):
+            raise Http404
+        # Стеки — текст, снимок tracemalloc — pickle для diff_memory.
+        content_type = ("text/plain" if dump.mode == STACKS
+                        else "application/octet-stream")
+        return FileResponse(
+            open(file_path, "rb"), as_attachment=True,
+            filename=dump.file_name, content_type=content_type)
+
+
+admin.site.register(ProfileDump, ProfileDumpAdmin)
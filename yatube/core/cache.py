@@ -0,0 +1,207 @@
+"""
+Кэш в локальном файле SQLite, общий для всех процессов на одной машине.
+
+LocMemCache хранит копию кэша в каждом воркере, поэтому с ростом числа
+воркеров падает доля попаданий. Этот бэкенд держит записи в одном файле
+SQLite в режиме WAL: читатели не блокируют писателя, а каждый процесс
+и поток открывает к файлу собственное соединение.
+
+Подключение::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+
+При превышении MAX_ENTRIES удаляются просроченные записи и 1/CULL_FREQUENCY
+давно не читавшихся (LRU). Время последнего чтения обновляется не чаще
+раза в LRU_RESOLUTION секунд, чтобы чтение не превращалось в запись.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .tracing import traced
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_size SET entries = entries + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_size SET entries = entries - 1;
+END;
+"""
+
+UPSERT = """
+INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    expires = excluded.expires,
+    accessed = excluded.accessed
+"""
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._lru_resolution = options.get('LRU_RESOLUTION', 1)
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # После fork() соединение родителя использовать нельзя.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            db = sqlite3.connect(
+                self._path, timeout=self._busy_timeout,
+                isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(SCHEMA)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return self._local.db
+
+    def _encode(self, value):
+        # Целые числа храним как есть, чтобы incr() не распаковывал pickle.
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @traced('cache.add')
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._db.execute(
+            UPSERT + ' WHERE cache.expires <= ?',
+            (key, self._encode(value), self.get_backend_timeout(timeout),
+             now, now))
+        if cursor.rowcount:
+            self._cull()
+        return cursor.rowcount == 1
+
+    @traced('cache.get')
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            return default
+        if now - accessed > self._lru_resolution:
+            self._db.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return self._decode(value)
+
+    @traced('cache.set')
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._db.execute(UPSERT, (
+            key, self._encode(value), self.get_backend_timeout(timeout),
+            time.time()))
+        self._cull()
+
+    @traced('cache.touch')
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount == 1
+
+    @traced('cache.delete')
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    @traced('cache.has_key')
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._db.execute(
+            'SELECT 1 FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone()
+        return row is not None
+
+    @traced('cache.incr')
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        # BEGIN IMMEDIATE сразу берёт блокировку на запись, поэтому
+        # чтение и обновление атомарны относительно других процессов.
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value FROM cache '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = self._decode(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._encode(new_value), key))
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return new_value
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _cull(self):
+        db = self._db
+        entries, = db.execute('SELECT entries FROM cache_size').fetchone()
+        if entries <= self._max_entries:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        entries, = db.execute('SELECT entries FROM cache_size').fetchone()
+        if entries <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            self.clear()
+            return
+        db.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (entries // self._cull_frequency,))
@@ -0,0 +1,54 @@
+"""
+Журналы в файлах JSON Lines с ротацией по размеру.
+
+Файл больше max_bytes переименовывается в .1, прежний .1 — в .2 и так
+до backups копий. Писать в один файл могут несколько процессов: строка
+дописывается одним вызовом write в режиме O_APPEND, поэтому строки не
+перемешиваются, но при одновременной ротации одна копия может
+потеряться.
+"""
+import json
+import os
+import threading
+
+_lock = threading.Lock()
+
+
+def rotate(path, backups):
+    for number in range(backups - 1, 0, -1):
+        if os.path.exists(f'{path}.{number}'):
+            os.replace(f'{path}.{number}', f'{path}.{number + 1}')
+    if backups:
+        os.replace(path, f'{path}.1')
+    else:
+        os.remove(path)
+
+
+def append(path, record, max_bytes, backups):
+    line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+    with _lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as file:
+            file.write(line)
+            size = file.tell()
+        if size > max_bytes:
+            try:
+                rotate(path, backups)
+            except FileNotFoundError:
+                # Файл уже переименовал другой процесс.
+                pass
+
+
+def read(path, backups):
+    """Записи из файла и его ротированных копий."""
+    paths = [path] + [f'{path}.{number}' for number in range(1, backups + 1)]
+    for name in paths:
+        if not os.path.exists(name):
+            continue
+        with open(name) as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Строка, оборванная при сбое процесса.
+                    continue
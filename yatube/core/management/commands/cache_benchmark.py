@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+
+def make_backends(directory):
+    params = {'OPTIONS': {'MAX_ENTRIES': 100000}}
+    return {
+        'locmem': lambda: LocMemCache('cache-benchmark', params),
+        'sqlite': lambda: SQLiteCache(
+            os.path.join(directory, 'cache.sqlite3'), params),
+    }
+
+
+def timed(operation, count):
+    """Число операций в секунду."""
+    started = time.perf_counter()
+    for number in range(count):
+        operation(number)
+    return count / (time.perf_counter() - started)
+
+
+def worker_misses(make_cache, keys, results):
+    """Как воркер с cache_page: читает ключ и при промахе заполняет его."""
+    cache = make_cache()
+    misses = 0
+    order = list(range(keys))
+    random.Random().shuffle(order)
+    for number in order:
+        if cache.get(f'page:{number}') is None:
+            misses += 1
+            cache.set(f'page:{number}', 'x' * 2048)
+    results.put(misses)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает общий SQLite-кэш с LocMemCache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=10000)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--keys', type=int, default=500)
+
+    def handle(self, *args, **options):
+        ops = options['ops']
+        with tempfile.TemporaryDirectory() as directory:
+            self.stdout.write(
+                f'{"backend":<8} {"set/s":>10} {"get/s":>10} {"incr/s":>10} '
+                f'{"hit ratio":>10}')
+            for name, make_cache in make_backends(directory).items():
+                cache = make_cache()
+                cache.clear()
+                set_rate = timed(
+                    lambda n: cache.set(f'key:{n % 1000}', {'n': n}), ops)
+                get_rate = timed(lambda n: cache.get(f'key:{n % 1000}'), ops)
+                cache.set('counter', 0)
+                incr_rate = timed(lambda n: cache.incr('counter'), ops)
+                cache.clear()
+                hit_ratio = self.hit_ratio(
+                    make_cache, options['workers'], options['keys'])
+                self.stdout.write(
+                    f'{name:<8} {set_rate:>10.0f} {get_rate:>10.0f} '
+                    f'{incr_rate:>10.0f} {hit_ratio:>10.2f}')
+
+    def hit_ratio(self, make_cache, workers, keys):
+        """Доля попаданий, когда несколько процессов читают одни ключи."""
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=worker_misses, args=(make_cache, keys, results))
+            for _ in range(workers)]
+        for process in processes:
+            process.start()
+        misses = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+        return 1 - misses / (workers * keys)
@@ -0,0 +1,45 @@
+import os
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import MEMORY, ProfileDump
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает снимки tracemalloc двух профилей запросов: '
+            'какие строки кода стали держать больше памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'old', help='Номер ProfileDump или путь к снимку.')
+        parser.add_argument('new')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--group-by', default='lineno',
+            choices=('lineno', 'filename', 'traceback'))
+
+    def handle(self, *args, **options):
+        old = self.load(options['old'])
+        new = self.load(options['new'])
+        stats = new.compare_to(old, options['group_by'])
+        total = sum(stat.size_diff for stat in stats)
+        self.stdout.write(f'Всего: {total / 1024:+.1f} KiB')
+        for stat in stats[:options['limit']]:
+            self.stdout.write(str(stat))
+            if options['group_by'] == 'traceback':
+                for line in stat.traceback.format():
+                    self.stdout.write(f'    {line}')
+
+    def load(self, value):
+        path = value
+        if value.isdigit():
+            dump = ProfileDump.objects.filter(pk=value, mode=MEMORY).first()
+            if dump is None:
+                raise CommandError(f'Нет профиля памяти №{value}.')
+            path = os.path.join(settings.PROFILING_DIR, dump.file_name)
+        try:
+            return tracemalloc.Snapshot.load(path)
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
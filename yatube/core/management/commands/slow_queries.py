@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import read_log
+
+
+class Command(BaseCommand):
+    help = 'Сводка медленных SQL-запросов по форме запроса.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument(
+            '--scans-only', action='store_true',
+            help='Только запросы с полным просмотром таблиц.')
+        parser.add_argument('--file', default=settings.SLOW_QUERY_LOG)
+
+    def handle(self, *args, **options):
+        shapes = {}
+        for entry in read_log(options['file']):
+            if options['scans_only'] and not entry['scans']:
+                continue
+            shape = shapes.setdefault(entry['shape'], {
+                'count': 0, 'total': 0, 'max': 0, 'scans': set(),
+                'plan': entry['plan']})
+            shape['count'] += 1
+            shape['total'] += entry['duration']
+            if entry['duration'] >= shape['max']:
+                shape['max'] = entry['duration']
+                shape['plan'] = entry['plan']
+            shape['scans'].update(entry['scans'])
+        if not shapes:
+            self.stdout.write('Медленных запросов нет.')
+        ranked = sorted(
+            shapes.items(), key=lambda item: item[1]['total'], reverse=True)
+        for sql, shape in ranked[:options['limit']]:
+            scans = ', '.join(sorted(shape['scans'])) or '—'
+            self.stdout.write(
+                f'{shape["total"]:.1f} ms всего  {shape["count"]} раз  '
+                f'макс. {shape["max"]:.1f} ms  полный просмотр: {scans}')
+            self.stdout.write(f'  {sql}')
+            for step in shape['plan'] or ['план недоступен']:
+                self.stdout.write(f'    {step}')
+            self.stdout.write('')
@@ -0,0 +1,63 @@
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.tracing import read_traces
+
+
+class Command(BaseCommand):
+    help = 'Показывает самые долгие записанные трассы запросов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=5)
+        parser.add_argument('--view', help='Только трассы этого имени URL.')
+        parser.add_argument(
+            '--min-ms', type=float, default=1.0,
+            help='Не показывать интервалы короче, мс.')
+        parser.add_argument('--file', default=settings.TRACING_FILE)
+
+    def handle(self, *args, **options):
+        traces = (trace for trace in read_traces(options['file'])
+                  if options['view'] in (None, trace['view']))
+        slowest = heapq.nlargest(
+            options['limit'], traces, key=lambda trace: trace['duration'])
+        if not slowest:
+            self.stdout.write('Трасс нет.')
+        for trace in slowest:
+            self.print_trace(trace, options['min_ms'])
+
+    def print_trace(self, trace, min_ms):
+        spans = trace['spans']
+        sql = [span for span in spans if span['name'] == 'sql']
+        self.stdout.write(
+            f'{trace["duration"]:.1f} ms  {trace["method"]} {trace["path"]}'
+            f'  {trace["view"]} ({trace["status"]})  {trace["started"]}'
+            f'  SQL: {len(sql)} / '
+            f'{sum(span.get("duration", 0) for span in sql):.1f} ms'
+            f'  id {trace["trace_id"]}')
+        children = defaultdict(list)
+        for span in spans:
+            children[span['parent']].append(span)
+        hidden = 0
+        stack = [(span, 1) for span in reversed(children[None])]
+        while stack:
+            span, depth = stack.pop()
+            duration = span.get('duration', 0)
+            if duration < min_ms:
+                hidden += 1
+                continue
+            attrs = ' '.join(
+                f'{key}={value}'
+                for key, value in span.get('attrs', {}).items())
+            self.stdout.write(
+                f'{"  " * depth}{duration:8.1f} ms  {span["name"]} {attrs}'
+                .rstrip()[:200])
+            stack.extend(
+                (child, depth + 1) for child in reversed(children[span['id']]))
+        if hidden or trace['dropped']:
+            self.stdout.write(
+                f'  скрыто короче {min_ms} мс: {hidden}, '
+                f'не записано: {trace["dropped"]}')
+        self.stdout.write('')
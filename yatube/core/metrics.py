@@ -0,0 +1,316 @@
+"""
+Метрики запросов в текстовом формате Prometheus.
+
+MetricsMiddleware записывает для каждого запроса с меткой имени URL
+длительность (гистограмма), число и время SQL-запросов, время отрисовки
+шаблонов и обращения к кэшу страниц и фрагментов (hit, miss, stale;
+доля попаданий считается в PromQL). Запись — несколько сложений в
+памяти процесса под блокировкой, без ввода-вывода.
+
+Раз в METRICS_FLUSH_INTERVAL секунд процесс сохраняет свои счётчики в
+собственный файл в METRICS_DIR, а view metrics складывает файлы всех
+процессов. Файлы завершившихся процессов при этом переносятся в общий
+файл retired.json, чтобы суммы счётчиков не убывали при перезапуске
+воркеров, а число файлов не росло с каждым перезапуском.
+
+Время шаблонов считает бэкенд core.metrics.DjangoTemplates; в него
+входят и запросы к базе, выполненные из шаблона.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+# Границы корзин гистограммы длительности запроса, в секундах.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNTERS = {
+    'yatube_requests_total': 'Число запросов по view и статусу ответа.',
+    'yatube_sql_queries_total': 'Число SQL-запросов.',
+    'yatube_sql_duration_seconds_total': 'Время SQL-запросов.',
+    'yatube_template_render_seconds_total': 'Время отрисовки шаблонов.',
+    'yatube_cache_requests_total': 'Обращения к кэшу страниц и фрагментов.',
+}
+HISTOGRAM = 'yatube_request_duration_seconds'
+UNRESOLVED = '<unresolved>'
+RETIRED = 'retired.json'
+
+_lock = threading.Lock()
+_local = threading.local()
+# (имя, метки) -> значение; метки — кортеж пар (имя, значение).
+_counters = Counter()
+# view -> счётчики по корзинам BUCKETS и +Inf, затем сумма длительностей.
+_histograms = {}
+_next_flush = 0
+# pid процесса, которому принадлежат счётчики, и имя его файла.
+_pid = None
+_filename = None
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'sql_time', 'template_time', 'cache')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache = Counter()
+
+
+def current():
+    """Метрики обрабатываемого в этом потоке запроса или None."""
+    return getattr(_local, 'request', None)
+
+
+def count_cache(result):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache[result] += 1
+
+
+def record(view, status, duration, metrics):
+    global _next_flush
+    labels = (('view', view),)
+    with _lock:
+        _check_fork()
+        histogram = _histograms.get(view)
+        if histogram is None:
+            histogram = _histograms[view] = [0] * (len(BUCKETS) + 1) + [0.0]
+        histogram[bisect_left(BUCKETS, duration)] += 1
+        histogram[-1] += duration
+        _counters['yatube_requests_total', labels
+                  + (('status', str(status)),)] += 1
+        _counters['yatube_sql_queries_total', labels] += metrics.queries
+        _counters['yatube_sql_duration_seconds_total',
+                  labels] += metrics.sql_time
+        _counters['yatube_template_render_seconds_total',
+                  labels] += metrics.template_time
+        for result, count in metrics.cache.items():
+            _counters['yatube_cache_requests_total', labels
+                      + (('result', result),)] += count
+        now = time.monotonic()
+        if now < _next_flush:
+            return
+        _next_flush = now + settings.METRICS_FLUSH_INTERVAL
+    flush()
+
+
+def _check_fork():
+    """
+    Заводит файл текущего процесса. Вызывается под _lock.
+
+    Воркеры серверов с prefork получают после fork() копию счётчиков
+    и имени файла мастера. Имя поэтому берётся по os.getpid() при
+    первом обращении в процессе, а унаследованные счётчики остаются
+    в файле мастера.
+    """
+    global _pid, _filename, _next_flush
+    pid = os.getpid()
+    if _pid == pid:
+        return
+    if _pid is not None:
+        _counters.clear()
+        _histograms.clear()
+        _next_flush = 0
+    _pid = pid
+    _filename = f'{pid}-{int(time.time() * 1000)}.json'
+
+
+def flush():
+    """Сохраняет счётчики процесса в его файл в METRICS_DIR."""
+    with _lock:
+        _check_fork()
+        filename = _filename
+        data = {
+            'counters': [[name, labels, value]
+                         for (name, labels), value in _counters.items()],
+            'histograms': _histograms,
+        }
+        data = json.dumps(data)
+    directory = settings.METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, filename)
+    with open(f'{path}.part', 'w') as file:
+        file.write(data)
+    os.replace(f'{path}.part', path)
+
+
+def process_alive(name):
+    """Жив ли процесс, записавший файл {pid}-{ms}.json."""
+    try:
+        os.kill(int(name.split('-')[0]), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        pass
+    return True
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def add(counters, histograms, data):
+    for metric, labels, value in data['counters']:
+        counters[metric, tuple(map(tuple, labels))] += value
+    for view, values in data['histograms'].items():
+        total = histograms.setdefault(view, [0] * len(values))
+        for index, value in enumerate(values):
+            total[index] += value
+
+
+def retire(directory):
+    """
+    Переносит счётчики завершившихся процессов в retired.json.
+
+    В retired.json записаны имена перенесённых файлов: если процесс
+    упадёт до их удаления, повторно они не сложатся. Вызывается под
+    блокировкой файла .lock.
+    """
+    path = os.path.join(directory, RETIRED)
+    retired = load(path) if os.path.exists(path) else {
+        'counters': [], 'histograms': {}, 'merged': []}
+    merged = set(retired['merged'])
+    present = set(os.listdir(directory))
+    names = {name for name in present
+             if name.endswith('.json') and name != RETIRED
+             and name not in merged and not process_alive(name)}
+    if names:
+        counters = Counter()
+        histograms = {}
+        add(counters, histograms, retired)
+        for name in names:
+            add(counters, histograms, load(os.path.join(directory, name)))
+        data = json.dumps({
+            'counters': [[name, labels, value]
+                         for (name, labels), value in counters.items()],
+            'histograms': histograms,
+            'merged': sorted((merged & present) | names),
+        })
+        with open(f'{path}.part', 'w') as file:
+            file.write(data)
+        os.replace(f'{path}.part', path)
+        merged |= names
+    for name in merged & present:
+        os.remove(os.path.join(directory, name))
+
+
+def collect():
+    """Счётчики и гистограммы всех процессов, сложенные вместе."""
+    flush()
+    directory = settings.METRICS_DIR
+    counters = Counter()
+    histograms = {}
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retire(directory)
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                add(counters, histograms,
+                    load(os.path.join(directory, name)))
+    return counters, histograms
+
+
+def escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+def render(counters, histograms):
+    lines = [
+        f'# HELP {HISTOGRAM} Длительность обработки запроса.',
+        f'# TYPE {HISTOGRAM} histogram',
+    ]
+    for view, values in sorted(histograms.items()):
+        labels = format_labels((('view', view),))
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), values):
+            cumulative += count
+            lines.append(
+                f'{HISTOGRAM}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{HISTOGRAM}_sum{{{labels}}} {values[-1]}')
+        lines.append(f'{HISTOGRAM}_count{{{labels}}} {cumulative}')
+    for metric, description in COUNTERS.items():
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} counter')
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f'{metric}{{{format_labels(labels)}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(
+        render(*collect()), content_type='text/plain; version=0.0.4')
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = _local.request = RequestMetrics()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self.time_query):
+                response = self.get_response(request)
+        finally:
+            _local.request = None
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        record(match.view_name if match else UNRESOLVED,
+               response.status_code, duration, metrics)
+        return response
+
+    @staticmethod
+    def time_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics = _local.request
+            if metrics is not None:
+                metrics.queries += 1
+                metrics.sql_time += time.perf_counter() - started
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics = current()
+            if metrics is not None:
+                metrics.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблоны Django с учётом времени отрисовки в метриках запроса."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.6 on 2026-10-17 04:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilingTrigger',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_name', models.CharField(help_text='Например, index, profile или api:post.', max_length=100, unique=True, verbose_name='имя URL')),
+                ('remaining', models.PositiveIntegerField(default=10, verbose_name='осталось запросов')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='создан')),
+            ],
+            options={
+                'verbose_name': 'профилирование страницы',
+                'verbose_name_plural': 'профилирование страниц',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileDump',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_name', models.CharField(db_index=True, max_length=100, verbose_name='имя URL')),
+                ('path', models.CharField(max_length=2000, verbose_name='адрес')),
+                ('file_name', models.CharField(max_length=255, verbose_name='файл')),
+                ('duration', models.FloatField(verbose_name='длительность, мс')),
+                ('samples', models.PositiveIntegerField(verbose_name='снимков стека')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='создан')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'профиль запроса',
+                'verbose_name_plural': 'профили запросов',
+                'ordering': ['-pk'],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.6 on 2026-10-17 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profiledump',
+            name='mode',
+            field=models.CharField(choices=[('stack', 'стеки вызовов'), ('memory', 'выделения памяти')], default='stack', max_length=10, verbose_name='что снято'),
+        ),
+        migrations.AddField(
+            model_name='profiledump',
+            name='peak_memory',
+            field=models.FloatField(blank=True, null=True, verbose_name='пик памяти, КБ'),
+        ),
+        migrations.AddField(
+            model_name='profiledump',
+            name='report',
+            field=models.TextField(blank=True, verbose_name='строки с наибольшими выделениями'),
+        ),
+        migrations.AddField(
+            model_name='profiledump',
+            name='retained_memory',
+            field=models.FloatField(blank=True, null=True, verbose_name='осталось занято, КБ'),
+        ),
+        migrations.AddField(
+            model_name='profilingtrigger',
+            name='mode',
+            field=models.CharField(choices=[('stack', 'стеки вызовов'), ('memory', 'выделения памяти')], default='stack', max_length=10, verbose_name='что снимать'),
+        ),
+        migrations.AlterField(
+            model_name='profiledump',
+            name='samples',
+            field=models.PositiveIntegerField(default=0, verbose_name='снимков стека'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import models
+
+
+STACKS = 'stack'
+MEMORY = 'memory'
+MODES = (
+    (STACKS, 'стеки вызовов'),
+    (MEMORY, 'выделения памяти'),
+)
+
+
+class ProfilingTrigger(models.Model):
+    """Сколько следующих запросов к странице снять профилировщиком."""
+    mode = models.CharField(
+        'что снимать', max_length=10, choices=MODES, default=STACKS)
+    url_name = models.CharField(
+        'имя URL', max_length=100, unique=True,
+        help_text='Например, index, profile или api:post.')
+    remaining = models.PositiveIntegerField('осталось запросов', default=10)
+    created = models.DateTimeField('создан', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'профилирование страницы'
+        verbose_name_plural = 'профилирование страниц'
+
+    def __str__(self):
+        return f'{self.url_name} ({self.mode}): {self.remaining}'
+
+
+class ProfileDump(models.Model):
+    """
+    Профиль одного запроса: стеки в формате folded или снимок
+    tracemalloc с выделенной за запрос и не освобождённой памятью.
+    """
+    mode = models.CharField(
+        'что снято', max_length=10, choices=MODES, default=STACKS)
+    url_name = models.CharField('имя URL', max_length=100, db_index=True)
+    path = models.CharField('адрес', max_length=2000)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='+')
+    file_name = models.CharField('файл', max_length=255)
+    duration = models.FloatField('длительность, мс')
+    samples = models.PositiveIntegerField('снимков стека', default=0)
+    peak_memory = models.FloatField('пик памяти, КБ', null=True, blank=True)
+    retained_memory = models.FloatField(
+        'осталось занято, КБ', null=True, blank=True)
+    report = models.TextField('строки с наибольшими выделениями', blank=True)
+    created = models.DateTimeField('создан', auto_now_add=True)
+
+    class Meta:
+        ordering = ['-pk']
+        verbose_name = 'профиль запроса'
+        verbose_name_plural = 'профили запросов'
+
+    def __str__(self):
+        return f'{self.url_name} {self.created:%Y-%m-%d %H:%M:%S}'
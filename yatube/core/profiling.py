@@ -0,0 +1,263 @@
+"""
+Профилировщик запросов по требованию.
+
+Профилируются следующие N запросов к странице, для имени URL которой в
+админке заведён ProfilingTrigger, и запросы сотрудников с параметром
+?profile=<подпись>, где подпись — signed_flag(имя URL, режим); её
+показывает админка триггеров. Результаты сохраняются в PROFILING_DIR и
+перечисляются в админке (ProfileDump).
+
+Режим stack: пока view обрабатывает запрос, отдельный поток раз в
+PROFILING_INTERVAL секунд снимает стек потока запроса через
+sys._current_frames(). Сам запрос при этом не замедляется трассировкой
+каждого вызова, как в cProfile. Стеки сохраняются в свёрнутом формате
+(«f1;f2;f3 N»), который понимают flamegraph.pl и speedscope.
+
+Режим memory: на время запроса включается tracemalloc. Сохраняются пик
+памяти, объём выделенного за запрос и не освобождённого к концу ответа,
+отчёт по строкам кода с наибольшими остатками и сам снимок; снимки
+разных запросов сравнивает команда diff_memory. tracemalloc учитывает
+все потоки процесса и замедляет запрос в разы, поэтому одновременно
+в процессе так профилируется только один запрос.
+
+Остальным запросам профилировщик стоит поиска имени URL в словаре:
+активные триггеры перечитываются из базы раз в PROFILING_REFRESH секунд.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MEMORY, STACKS, ProfileDump, ProfilingTrigger
+from .queries import unrecorded
+
+SALT = 'core.profiling'
+# Подпись ?profile= действует сутки.
+FLAG_MAX_AGE = 60 * 60 * 24
+# Сколько кадров стека хранит tracemalloc и строк попадает в отчёт.
+MEMORY_FRAMES = 10
+REPORT_LINES = 30
+
+_triggers = {}
+_expires = 0
+
+
+def signed_flag(url_name, mode=STACKS):
+    return signing.dumps([url_name, mode], salt=SALT)
+
+
+def forget_triggers():
+    """Перечитать триггеры из базы при следующем запросе."""
+    global _expires
+    _expires = 0
+
+
+def active_triggers():
+    global _triggers, _expires
+    now = time.monotonic()
+    if now >= _expires:
+        _triggers = {
+            url_name: (pk, mode)
+            for pk, url_name, mode in ProfilingTrigger.objects.filter(
+                remaining__gt=0).values_list('pk', 'url_name', 'mode')}
+        _expires = now + settings.PROFILING_REFRESH
+    return _triggers
+
+
+def flagged(request, url_name):
+    """Режим из подписанного ?profile= сотрудника или None."""
+    token = request.GET.get('profile')
+    if not token:
+        return None
+    try:
+        signed_name, mode = signing.loads(
+            token, salt=SALT, max_age=FLAG_MAX_AGE)
+    except (signing.BadSignature, ValueError):
+        return None
+    if signed_name != url_name or not request.user.is_staff:
+        return None
+    return mode
+
+
+def take_attempt(pk):
+    """Забирает попытку триггера; False, если их уже не осталось."""
+    taken = ProfilingTrigger.objects.filter(
+        pk=pk, remaining__gt=0).update(remaining=F('remaining') - 1)
+    if not taken:
+        forget_triggers()
+    return bool(taken)
+
+
+def frame_name(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    return f'{code.co_name} ({filename}:{frame.f_lineno})'
+
+
+def fold(frame):
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Снимает стек потока thread_id раз в interval секунд."""
+    mode = STACKS
+    extension = 'folded'
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread.start()
+        return True
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[fold(frame)] += 1
+
+    def folded(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items())
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            file.write(self.folded())
+        return {'samples': sum(self.stacks.values())}
+
+
+class AllocationTracer:
+    """Память, выделенная за время запроса, по строкам кода."""
+    mode = MEMORY
+    extension = 'tracemalloc'
+    lock = threading.Lock()
+
+    def start(self):
+        if not self.lock.acquire(blocking=False):
+            return False
+        self.started = time.perf_counter()
+        self.was_tracing = tracemalloc.is_tracing()
+        if self.was_tracing:
+            self.before = self.take_snapshot()
+            tracemalloc.reset_peak()
+        else:
+            self.before = None
+            tracemalloc.start(MEMORY_FRAMES)
+        return True
+
+    def stop(self):
+        try:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            self.snapshot = self.take_snapshot()
+            if not self.was_tracing:
+                tracemalloc.stop()
+        finally:
+            self.lock.release()
+        self.duration = time.perf_counter() - self.started
+
+    @staticmethod
+    def take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    def retained(self):
+        """Выделенное за запрос и не освобождённое, по строкам кода."""
+        if self.before is None:
+            # Трассировка началась с запросом: всё в снимке — его.
+            return self.snapshot.statistics('lineno')
+        return [stat for stat in self.snapshot.compare_to(
+            self.before, 'lineno') if stat.size_diff > 0]
+
+    def save(self, path):
+        self.snapshot.dump(path)
+        stats = self.retained()
+        size = sum(getattr(stat, 'size_diff', stat.size) for stat in stats)
+        report = '\n'.join(str(stat) for stat in stats[:REPORT_LINES])
+        return {'peak_memory': self.peak / 1024,
+                'retained_memory': size / 1024, 'report': report}
+
+
+PROFILERS = {
+    STACKS: lambda: Sampler(
+        threading.get_ident(), settings.PROFILING_INTERVAL),
+    MEMORY: AllocationTracer,
+}
+
+
+def save_dump(request, profiler):
+    url_name = request.resolver_match.view_name
+    file_name = '{}-{}-{}.{}'.format(
+        timezone.now().strftime('%Y%m%d-%H%M%S-%f'), os.getpid(),
+        url_name.replace(':', '-'), profiler.extension)
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    fields = profiler.save(os.path.join(settings.PROFILING_DIR, file_name))
+    user = request.user if request.user.is_authenticated else None
+    return ProfileDump.objects.create(
+        mode=profiler.mode, url_name=url_name,
+        path=request.get_full_path()[:2000], user=user, file_name=file_name,
+        duration=profiler.duration * 1000, **fields)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        profiler = getattr(request, 'profiler', None)
+        if profiler is not None:
+            profiler.stop()
+            with unrecorded():
+                save_dump(request, profiler)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        url_name = request.resolver_match.view_name
+        # Запросы к базе профилировщика не входят в бюджет view.
+        with unrecorded():
+            mode = flagged(request, url_name)
+            pk = None
+            if mode is None:
+                pk, mode = active_triggers().get(url_name, (None, None))
+        if mode not in PROFILERS:
+            return None
+        profiler = PROFILERS[mode]()
+        if not profiler.start():
+            return None
+        # Попытка триггера тратится, только когда профилировщик
+        # запустился: при занятом tracemalloc она достаётся следующему.
+        if pk is not None:
+            with unrecorded():
+                taken = take_attempt(pk)
+            if not taken:
+                profiler.stop()
+                return None
+        request.profiler = profiler
+        return None
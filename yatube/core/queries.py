@@ -0,0 +1,129 @@
+"""
+Учёт SQL-запросов запроса и бюджеты запросов view.
+
+QueryBudgetMiddleware записывает все запросы к базе за время обработки
+запроса и сводит их по форме: литералы и списки IN заменяются метками,
+поэтому один и тот же запрос в цикле (N+1) даёт много повторов одной
+формы. Если запросов больше бюджета view или какая-то форма повторилась
+больше QUERY_REPEAT_LIMIT раз, middleware пишет предупреждение в журнал
+('log') или бросает QueryBudgetExceeded ('raise'), в зависимости от
+настройки QUERY_BUDGETS. Когда она пуста, middleware отключается.
+
+Бюджет объявляется декоратором::
+
+    @query_budget(5)
+    def index(request):
+        ...
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+LITERALS_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+SAVEPOINT_RE = re.compile(r'"s\d+_x\d+"')
+IN_LIST_RE = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+SPACES_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def normalize(sql):
+    """Форма запроса: без значений параметров и длины списков IN."""
+    shape = SAVEPOINT_RE.sub('?', sql)
+    shape = LITERALS_RE.sub('?', shape)
+    shape = IN_LIST_RE.sub('IN (...)', shape)
+    return SPACES_RE.sub(' ', shape).strip()
+
+
+class QueryRecorder:
+    """
+    Обёртка execute для connection.execute_wrapper(), запоминающая
+    формы и длительность запросов.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (sql, time.perf_counter() - started))
+
+    def __len__(self):
+        return len(self.queries)
+
+    def shapes(self):
+        return Counter(normalize(sql) for sql, _ in self.queries)
+
+    def problems(self, budget=None, repeat_limit=None):
+        """Описания нарушений бюджета и повторов; пустой список — их нет."""
+        problems = []
+        if budget is not None and len(self) > budget:
+            problems.append(f'{len(self)} запросов при бюджете {budget}')
+        if repeat_limit is not None:
+            for shape, count in self.shapes().most_common():
+                if count <= repeat_limit:
+                    break
+                problems.append(f'{count} раз: {shape}')
+        return problems
+
+
+@contextmanager
+def unrecorded():
+    """Запросы внутри блока не попадают в учёт текущего запроса."""
+    wrappers = connection.execute_wrappers
+    paused = [wrapper for wrapper in wrappers
+              if isinstance(wrapper, QueryRecorder)]
+    connection.execute_wrappers = [
+        wrapper for wrapper in wrappers if wrapper not in paused]
+    try:
+        yield
+    finally:
+        connection.execute_wrappers = wrappers
+
+
+def query_budget(total):
+    """Объявляет, сколько запросов к базе может сделать view."""
+    def decorator(view_func):
+        view_func.query_budget = total
+        return view_func
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'QUERY_BUDGETS', None)
+        if not self.mode:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        problems = recorder.problems(
+            getattr(match.func, 'query_budget', None),
+            settings.QUERY_REPEAT_LIMIT)
+        if problems:
+            message = f'{match.view_name} ({request.method} ' \
+                f'{request.path}): ' + '; '.join(problems)
+            if self.mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
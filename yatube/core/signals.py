@@ -0,0 +1,27 @@
+import os
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import profiling, slow_queries
+from .models import ProfileDump, ProfilingTrigger
+
+
+@receiver(post_save, sender=ProfilingTrigger)
+@receiver(post_delete, sender=ProfilingTrigger)
+def forget_profiling_triggers(sender, **kwargs):
+    profiling.forget_triggers()
+
+
+@receiver(post_delete, sender=ProfileDump)
+def delete_profile_file(sender, instance, **kwargs):
+    path = os.path.join(settings.PROFILING_DIR, instance.file_name)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    slow_queries.install(connection)
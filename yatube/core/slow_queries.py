@@ -0,0 +1,101 @@
+"""
+Журнал медленных SQL-запросов с планом выполнения.
+
+Обёртка log_slow_query ставится на каждое соединение с SQLite при его
+открытии (сигнал connection_created), поэтому видит запросы view,
+команд и фоновых потоков. Запрос дольше SLOW_QUERY_THRESHOLD секунд
+записывается в SLOW_QUERY_LOG вместе с EXPLAIN QUERY PLAN. Полный
+просмотр (шаг SCAN) таблиц из SLOW_QUERY_TABLES отмечается
+отдельно и пишется в журнал предупреждением.
+
+EXPLAIN выполняется на том же соединении, но мимо обёрток execute,
+чтобы не попасть в бюджеты запросов, метрики и трассы. Команда
+slow_queries сводит записи по форме запроса.
+"""
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db.backends.sqlite3.base import Database, SQLiteCursorWrapper
+from django.utils import timezone
+
+from . import jsonl
+from .queries import normalize
+
+logger = logging.getLogger(__name__)
+
+# «SCAN posts_post» в SQLite 3.36+, «SCAN TABLE posts_post» раньше.
+# SCAN ... USING INDEX тоже обходит все строки, только в порядке
+# индекса; выборка по индексу выглядит как SEARCH.
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+SQL_LENGTH = 2000
+
+_local = threading.local()
+
+
+def explain(connection, sql, params):
+    """Шаги EXPLAIN QUERY PLAN или None, если план не получить."""
+    cursor = SQLiteCursorWrapper(connection.connection)
+    try:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[3] for row in cursor.fetchall()]
+    except (Database.Error, ValueError):
+        return None
+    finally:
+        cursor.close()
+
+
+def full_scans(plan):
+    tables = []
+    for step in plan or ():
+        match = SCAN_RE.match(step)
+        if match and match.group(1) in settings.SLOW_QUERY_TABLES:
+            tables.append(match.group(1))
+    return tables
+
+
+def read_log(path):
+    return jsonl.read(path, settings.SLOW_QUERY_BACKUPS)
+
+
+def log_slow_query(execute, sql, params, many, context):
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    if threshold is None or many or getattr(_local, 'logging', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        if duration >= threshold:
+            _local.logging = True
+            try:
+                record(context['connection'], sql, params, duration)
+            finally:
+                _local.logging = False
+
+
+def record(connection, sql, params, duration):
+    plan = explain(connection, sql, params)
+    scans = full_scans(plan)
+    if scans:
+        logger.warning(
+            'Полный просмотр %s за %.1f мс: %s',
+            ', '.join(scans), duration * 1000, sql[:SQL_LENGTH])
+    jsonl.append(settings.SLOW_QUERY_LOG, {
+        'time': timezone.now().isoformat(),
+        'duration': round(duration * 1000, 3),
+        'shape': normalize(sql)[:SQL_LENGTH],
+        'sql': sql[:SQL_LENGTH],
+        'plan': plan,
+        'scans': scans,
+    }, settings.SLOW_QUERY_MAX_BYTES, settings.SLOW_QUERY_BACKUPS)
+
+
+def install(connection):
+    """Ставит обёртку на соединение один раз, даже после переподключений."""
+    if (connection.vendor == 'sqlite' and settings.SLOW_QUERY_LOG
+            and log_slow_query not in connection.execute_wrappers):
+        connection.execute_wrappers.insert(0, log_slow_query)
@@ -0,0 +1,41 @@
+from django import template
+from django.template.base import token_kwargs
+
+from .. import tracing
+
+register = template.Library()
+
+
+class SpanNode(template.Node):
+    def __init__(self, nodelist, name, attrs):
+        self.nodelist = nodelist
+        self.name = name
+        self.attrs = attrs
+
+    def render(self, context):
+        if tracing.current() is None:
+            return self.nodelist.render(context)
+        attrs = {key: value.resolve(context)
+                 for key, value in self.attrs.items()}
+        with tracing.span(self.name.resolve(context), **attrs):
+            return self.nodelist.render(context)
+
+
+@register.tag
+def span(parser, token):
+    """
+    Интервал трассы запроса вокруг части шаблона:
+
+        {% span 'post_card' post=post.pk %} ... {% endspan %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires a span name.")
+    attrs = token_kwargs(bits[2:], parser)
+    if len(attrs) != len(bits) - 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag accepts only key=value attributes.")
+    nodelist = parser.parse(('endspan',))
+    parser.delete_first_token()
+    return SpanNode(nodelist, parser.compile_filter(bits[1]), attrs)
@@ -0,0 +1,39 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def temporary_settings(directory, **overrides):
+    """Кэши и метрики тестов во временном каталоге, а не в рабочих."""
+    return override_settings(
+        CACHES={
+            alias: dict(config, LOCATION=os.path.join(
+                directory, f'cache-{alias}.sqlite3'))
+            for alias, config in settings.CACHES.items()},
+        METRICS_DIR=os.path.join(directory, 'metrics'),
+        **overrides,
+    )
+
+
+class CacheClearingRunner(DiscoverRunner):
+    """
+    Запускает тесты с кэшем и метриками во временном каталоге: кэш
+    сервера разработки не очищается и не смешивается с тестовым.
+    Превышение бюджета запросов view проваливает тест.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.directory = tempfile.mkdtemp()
+        self.test_settings = temporary_settings(
+            self.directory, QUERY_BUDGETS='raise')
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        shutil.rmtree(self.directory)
+        super().teardown_test_environment(**kwargs)
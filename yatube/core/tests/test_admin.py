@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from ..admin import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(username=f'user{number}') for number in range(5))
+
+    def paginator(self, queryset, limit):
+        paginator = EstimatedCountPaginator(queryset, 2)
+        paginator.limit = limit
+        return paginator
+
+    def test_small_tables_are_counted_exactly(self):
+        """Пока строк не больше limit, число точное."""
+        paginator = self.paginator(User.objects.all(), 10)
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(paginator.num_pages, 3)
+
+    def test_large_tables_are_estimated(self):
+        """Сверх limit выборка без фильтров оценивается по pk."""
+        User.objects.filter(username='user0').delete()
+        last = User.objects.order_by('pk').last().pk
+        with self.assertNumQueries(2):
+            count = self.paginator(User.objects.all(), 2).count
+        self.assertEqual(count, last)
+        filtered = User.objects.filter(username__startswith='user')
+        self.assertEqual(self.paginator(filtered, 2).count, 3)
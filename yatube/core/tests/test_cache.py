@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from ..cache import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_set_get_delete(self):
+        """Значения сохраняются, читаются и удаляются."""
+        values = {'int': 42, 'str': 'текст', 'dict': {'a': [1, 2]},
+                  'bool': True, 'none': None}
+        for key, value in values.items():
+            with self.subTest(key=key):
+                self.cache.set(key, value)
+                self.assertEqual(self.cache.get(key, 'default'), value)
+                self.assertIs(type(self.cache.get(key)), type(value))
+                self.cache.delete(key)
+                self.assertEqual(self.cache.get(key, 'default'), 'default')
+
+    def test_shared_between_instances(self):
+        """Записи видны другому соединению к тому же файлу."""
+        self.cache.set('shared', 'value')
+        self.assertEqual(self.make_cache().get('shared'), 'value')
+
+    def test_expiry_and_add(self):
+        """Просроченная запись не читается, и add() может её заменить."""
+        self.cache.set('key', 'old', timeout=0.05)
+        self.assertFalse(self.cache.add('key', 'new'))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_incr(self):
+        """incr() атомарно увеличивает число и падает на пустом ключе."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.make_cache().decr('counter'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_cull(self):
+        """При переполнении удаляются давно не читавшиеся записи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=4, CULL_FREQUENCY=2, LRU_RESOLUTION=0)
+        for number in range(4):
+            cache.set(number, number)
+            time.sleep(0.01)
+        cache.get(0)
+        cache.set(4, 4)
+        self.assertEqual(
+            [number for number in range(5) if cache.has_key(number)],
+            [0, 3, 4])
+
+
+class TestCacheLocationTests(SimpleTestCase):
+    def test_tests_do_not_share_the_dev_cache(self):
+        """Тесты пишут в свой файл кэша, а не в кэш сервера разработки."""
+        self.assertNotEqual(
+            os.path.dirname(caches['default']._path), settings.BASE_DIR)
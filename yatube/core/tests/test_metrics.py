@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+from .. import metrics
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(METRICS_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory
+        cache.clear()
+
+    def scrape(self):
+        response = Client().get('/metrics')
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; version=0.0.4')
+        return response.content.decode()
+
+    def value(self, text, line):
+        for found in text.splitlines():
+            if found.startswith(line + ' '):
+                return float(found.split()[-1])
+        self.fail(f'{line} не найдена')
+
+    def test_requests_are_recorded_per_view(self):
+        """Запросы учитываются по имени URL: время, SQL, шаблоны, кэш."""
+        before = self.scrape()
+        for _ in range(2):
+            Client().get('/')
+        after = self.scrape()
+        for line in (
+                'yatube_request_duration_seconds_count{view="index"}',
+                'yatube_requests_total{view="index",status="200"}'):
+            self.assertEqual(
+                self.value(after, line)
+                - (self.value(before, line) if line in before else 0), 2)
+        for line in (
+                'yatube_sql_queries_total{view="index"}',
+                'yatube_template_render_seconds_total{view="index"}',
+                'yatube_cache_requests_total{view="index",result="hit"}',
+                'yatube_request_duration_seconds_bucket'
+                '{view="index",le="+Inf"}'):
+            self.assertGreater(self.value(after, line), 0)
+
+    def test_files_of_other_processes_are_merged(self):
+        """Счётчики из файлов других процессов складываются."""
+        with open(os.path.join(self.directory, '1-1.json'), 'w') as file:
+            json.dump({
+                'counters': [['yatube_sql_queries_total',
+                              [['view', 'other']], 5]],
+                'histograms': {'other': [1] + [0] * len(metrics.BUCKETS)
+                               + [0.001]},
+            }, file)
+        text = self.scrape()
+        self.assertEqual(
+            self.value(text, 'yatube_sql_queries_total{view="other"}'), 5)
+        self.assertEqual(self.value(
+            text, 'yatube_request_duration_seconds_bucket'
+            '{view="other",le="10"}'), 1)
+
+    def test_files_of_finished_processes_are_retired(self):
+        """Файлы завершившихся процессов сливаются в один без повторов."""
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        dead = f'{process.pid}-1.json'
+        with open(os.path.join(self.directory, dead), 'w') as file:
+            json.dump({
+                'counters': [['yatube_sql_queries_total',
+                              [['view', 'other']], 5]],
+                'histograms': {},
+            }, file)
+        line = 'yatube_sql_queries_total{view="other"}'
+        for _ in range(2):
+            self.assertEqual(self.value(self.scrape(), line), 5)
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.directory)
+                   if name.endswith('.json') and name != metrics._filename),
+            [metrics.RETIRED])
+
+    def test_forked_process_writes_own_file(self):
+        """После fork() воркер пишет свой файл без счётчиков мастера."""
+        Client().get('/')
+        pid = os.fork()
+        if pid == 0:
+            try:
+                metrics.flush()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith(f'{pid}-')]
+        self.assertEqual(len(names), 1)
+        data = metrics.load(os.path.join(self.directory, names[0]))
+        self.assertEqual(data, {'counters': [], 'histograms': {}})
+        metrics.flush()
+        self.assertTrue(metrics._filename.startswith(f'{os.getpid()}-'))
+
+    def test_retired_files_are_not_counted_twice(self):
+        """Файл, уже перенесённый в retired.json, не складывается снова."""
+        data = {
+            'counters': [['yatube_sql_queries_total', [['view', 'other']], 5]],
+            'histograms': {},
+        }
+        with open(os.path.join(self.directory, '2-1.json'), 'w') as file:
+            json.dump(data, file)
+        with open(os.path.join(self.directory, metrics.RETIRED), 'w') as file:
+            json.dump(dict(data, merged=['2-1.json']), file)
+        text = self.scrape()
+        self.assertEqual(
+            self.value(text, 'yatube_sql_queries_total{view="other"}'), 5)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.directory, '2-1.json')))
+
+    def test_only_internal_ips(self):
+        """Метрики отдаются только адресам из INTERNAL_IPS."""
+        response = Client(REMOTE_ADDR='10.0.0.1').get('/metrics')
+        self.assertEqual(response.status_code, 404)
+
+    def test_labels_are_escaped(self):
+        self.assertEqual(
+            metrics.format_labels((('view', 'a"b\\c'),)), 'view="a\\"b\\\\c"')
@@ -0,0 +1,121 @@
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import MEMORY, ProfileDump, ProfilingTrigger
+from ..profiling import AllocationTracer, Sampler, signed_flag
+
+User = get_user_model()
+
+
+def busy(seconds):
+    finish = time.perf_counter() + seconds
+    while time.perf_counter() < finish:
+        pass
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(
+            PROFILING_DIR=directory, PROFILING_INTERVAL=0.001)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+
+    def client_for(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def test_sampler_folds_stacks(self):
+        """Стеки потока сворачиваются в строки «f1;f2;f3 N»."""
+        sampler = Sampler(threading.get_ident(), 0.001)
+        sampler.start()
+        busy(0.05)
+        sampler.stop()
+        lines = sampler.folded().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(any('busy (' in line for line in lines))
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+
+    def test_trigger_profiles_next_requests(self):
+        """Триггер снимает заданное число запросов к странице."""
+        ProfilingTrigger.objects.create(url_name='index', remaining=2)
+        for _ in range(3):
+            Client().get(reverse('index'))
+        Client().get(reverse('search'))
+        self.assertEqual(
+            list(ProfileDump.objects.values_list('url_name', flat=True)),
+            ['index', 'index'])
+        self.assertEqual(ProfilingTrigger.objects.get().remaining, 0)
+
+    def test_signed_flag_for_staff_only(self):
+        """Параметр ?profile= действует для сотрудников и своей страницы."""
+        url = reverse('index')
+        self.client_for(self.user).get(url, {'profile': signed_flag('index')})
+        self.client_for(self.staff).get(url, {'profile': 'index'})
+        self.client_for(self.staff).get(
+            url, {'profile': signed_flag('search')})
+        self.assertFalse(ProfileDump.objects.exists())
+        self.client_for(self.staff).get(url, {'profile': signed_flag('index')})
+        dump = ProfileDump.objects.get()
+        self.assertEqual(dump.user, self.staff)
+
+    def test_dump_is_downloaded_from_admin(self):
+        """Файл стеков скачивается из админки и удаляется вместе с записью."""
+        ProfilingTrigger.objects.create(url_name='index', remaining=1)
+        Client().get(reverse('index'))
+        dump = ProfileDump.objects.get()
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'password')
+        client = self.client_for(admin)
+        response = client.get(reverse(
+            'admin:core_profiledump_download', args=[dump.pk]))
+        self.assertEqual(response.status_code, 200)
+        response = client.get(reverse('admin:core_profiledump_changelist'))
+        self.assertContains(response, dump.file_name)
+        url = reverse('admin:core_profiledump_download', args=[dump.pk])
+        dump.delete()
+        self.assertEqual(client.get(url).status_code, 404)
+
+    def test_memory_mode(self):
+        """Режим memory сохраняет пик, остаток памяти и снимок."""
+        ProfilingTrigger.objects.create(
+            url_name='index', mode=MEMORY, remaining=2)
+        for _ in range(2):
+            Client().get(reverse('index'))
+        old, new = ProfileDump.objects.order_by('pk')
+        self.assertEqual(new.mode, MEMORY)
+        self.assertGreater(new.peak_memory, 0)
+        self.assertGreater(new.retained_memory, 0)
+        self.assertIn('.py:', new.report)
+        out = StringIO()
+        call_command('diff_memory', str(old.pk), str(new.pk), stdout=out)
+        self.assertIn('Всего:', out.getvalue())
+
+    def test_busy_tracer_keeps_trigger_attempt(self):
+        """Запрос, не запустивший tracemalloc, не тратит попытку."""
+        trigger = ProfilingTrigger.objects.create(
+            url_name='index', mode=MEMORY, remaining=1)
+        with AllocationTracer.lock:
+            Client().get(reverse('index'))
+        trigger.refresh_from_db()
+        self.assertEqual(trigger.remaining, 1)
+        self.assertFalse(ProfileDump.objects.exists())
+        Client().get(reverse('index'))
+        self.assertEqual(ProfileDump.objects.get().mode, MEMORY)
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve
+
+from ..queries import (QueryBudgetExceeded, QueryBudgetMiddleware,
+                       normalize, query_budget, unrecorded)
+
+User = get_user_model()
+
+
+def run_queries(count):
+    for number in range(count):
+        User.objects.filter(username=f'user{number}').exists()
+
+
+class QueryBudgetTests(TestCase):
+    def get(self, get_response, budget=None):
+        request = RequestFactory().get('/')
+        request.resolver_match = resolve('/')
+        request.resolver_match.func = query_budget(budget)(
+            lambda request: None)
+        return QueryBudgetMiddleware(get_response)(request)
+
+    def queries_view(self, count):
+        def view(request):
+            run_queries(count)
+            return HttpResponse()
+        return view
+
+    def test_normalize(self):
+        """Форма запроса не зависит от значений и длины списка IN."""
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE a = 'x' AND b IN (1, 2, 3)"),
+            normalize("SELECT  * FROM t WHERE a = 'y''z' AND b IN (7)"))
+        self.assertEqual(
+            normalize('SELECT * FROM t WHERE a = %s'),
+            'SELECT * FROM t WHERE a = ?')
+
+    @override_settings(QUERY_BUDGETS='raise', QUERY_REPEAT_LIMIT=10)
+    def test_budget(self):
+        """Запросов больше бюджета view — исключение."""
+        self.get(self.queries_view(3), budget=3)
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'бюджете 3'):
+            self.get(self.queries_view(4), budget=3)
+
+    @override_settings(QUERY_BUDGETS='log', QUERY_REPEAT_LIMIT=10)
+    def test_budget_logged(self):
+        """В режиме 'log' превышение бюджета не мешает ответу."""
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            response = self.get(self.queries_view(4), budget=3)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('4 запросов при бюджете 3', logs.output[0])
+
+    @override_settings(QUERY_BUDGETS='log', QUERY_REPEAT_LIMIT=1)
+    def test_repeated_shapes_are_logged(self):
+        """Повторы одной формы запроса пишутся в журнал."""
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            self.get(self.queries_view(2))
+        self.assertIn('2 раз: SELECT', logs.output[0])
+
+    @override_settings(QUERY_BUDGETS='raise', QUERY_REPEAT_LIMIT=1)
+    def test_unrecorded(self):
+        """Запросы внутри unrecorded() не учитываются."""
+        def view(request):
+            with unrecorded():
+                run_queries(5)
+            return HttpResponse()
+
+        self.get(view, budget=0)
+
+    @override_settings(QUERY_BUDGETS=None)
+    def test_disabled(self):
+        """Без QUERY_BUDGETS middleware не подключается."""
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryBudgetMiddleware(self.queries_view(0))
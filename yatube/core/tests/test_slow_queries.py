@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.slow_queries import read_log
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SlowQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Текст поста', author=cls.author)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'slow.jsonl')
+        settings = override_settings(
+            SLOW_QUERY_LOG=self.path, SLOW_QUERY_THRESHOLD=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def entries(self):
+        return list(read_log(self.path))
+
+    def test_full_scan_is_flagged(self):
+        """Поиск по тексту просматривает таблицу постов целиком."""
+        with self.assertLogs('core.slow_queries', 'WARNING'):
+            list(Post.objects.filter(text__contains='поста'))
+        entry, = self.entries()
+        self.assertEqual(entry['scans'], ['posts_post'])
+        self.assertIn('LIKE ?', entry['shape'])
+        self.assertTrue(entry['plan'])
+
+    def test_index_lookup_is_not_flagged(self):
+        """Выборка по первичному ключу идёт по индексу."""
+        Post.objects.get(pk=self.post.pk)
+        entry, = self.entries()
+        self.assertEqual(entry['scans'], [])
+        self.assertTrue(entry['plan'][0].startswith('SEARCH'))
+
+    def test_threshold(self):
+        """Быстрые запросы не записываются."""
+        with self.settings(SLOW_QUERY_THRESHOLD=60):
+            Post.objects.get(pk=self.post.pk)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_command_groups_by_shape(self):
+        """Команда сводит запросы одной формы в строку."""
+        with self.assertLogs('core.slow_queries', 'WARNING'):
+            for word in ('один', 'два', 'три'):
+                list(Post.objects.filter(text__contains=word))
+        Post.objects.get(pk=self.post.pk)
+        out = StringIO()
+        call_command('slow_queries', scans_only=True, file=self.path,
+                     stdout=out)
+        output = out.getvalue()
+        self.assertIn('3 раз', output)
+        self.assertIn('полный просмотр: posts_post', output)
+        self.assertNotIn('"posts_post"."id" = %s', output)
@@ -0,0 +1,82 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class TracingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Текст поста', author=author)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'traces.jsonl')
+        settings = override_settings(TRACING_FILE=self.path, TRACING_SLOW=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+
+    def traces(self):
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_span_tree(self):
+        """Трасса содержит дерево интервалов запроса."""
+        Client().get(reverse('index'))
+        trace, = self.traces()
+        self.assertEqual(trace['view'], 'index')
+        spans = {span['id']: span for span in trace['spans']}
+        parents = {span['name']: spans[span['parent']]['name']
+                   for span in spans.values() if span['parent'] is not None}
+        self.assertEqual(parents['resolve'], 'request')
+        self.assertEqual(parents['view'], 'request')
+        self.assertEqual(parents['post_card'], 'view')
+        self.assertIn('cache.get', parents)
+        self.assertIn('sql', parents)
+        card = next(span for span in spans.values()
+                    if span['name'] == 'post_card')
+        self.assertEqual(card['attrs'], {'post': Post.objects.get().pk})
+        for span in spans.values():
+            self.assertGreaterEqual(span['duration'], 0)
+
+    def test_fast_requests_are_not_kept(self):
+        """Быстрые запросы не записываются."""
+        with self.settings(TRACING_SLOW=60):
+            Client().get(reverse('index'))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_rotation(self):
+        """Файл ротируется по размеру, лишние копии удаляются."""
+        with self.settings(TRACING_MAX_BYTES=1, TRACING_BACKUPS=2):
+            for _ in range(4):
+                Client().get(reverse('about:author'))
+        self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(os.path.exists(f'{self.path}.2'))
+        self.assertFalse(os.path.exists(f'{self.path}.3'))
+
+    def test_slow_traces_command(self):
+        """Команда выводит самые долгие трассы с интервалами."""
+        Client().get(reverse('index'))
+        Client().get(reverse('search'), {'q': 'текст'})
+        out = StringIO()
+        call_command(
+            'slow_traces', view='search', min_ms=0, file=self.path,
+            stdout=out)
+        output = out.getvalue()
+        self.assertIn('GET /search/?q=', output)
+        self.assertNotIn('GET / ', output)
+        self.assertIn(' view view=search', output)
@@ -0,0 +1,176 @@
+"""
+Трассировка запросов: дерево интервалов (span) каждого запроса.
+
+TracingMiddleware открывает трассу запроса и интервалы SQL-запросов,
+ViewTracingMiddleware, последний в MIDDLEWARE, отмечает разбор URL и
+работу view. Остальное размечается вручную: span() как контекстный
+менеджер, traced() как декоратор и {% span %} в шаблонах. Вне трассы
+span() ничего не записывает.
+
+Трасса записывается, только если запрос шёл не меньше TRACING_SLOW
+секунд или завершился ошибкой (tail sampling): решение принимается,
+когда запрос уже обработан. Трассы пишутся строками JSON в
+TRACING_FILE с ротацией по TRACING_MAX_BYTES и TRACING_BACKUPS (см.
+core.jsonl). Самые долгие трассы показывает команда slow_traces.
+"""
+import threading
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils import timezone
+
+from . import jsonl
+
+# Больше интервалов в трассе не записывается, лишние только считаются.
+MAX_SPANS = 5000
+SQL_LENGTH = 500
+
+_local = threading.local()
+
+
+class Trace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.stack = []
+        self.dropped = 0
+
+    def now(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def open(self, name, attrs, start=None):
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return None
+        record = {
+            'id': len(self.spans),
+            'parent': self.stack[-1]['id'] if self.stack else None,
+            'name': name,
+            'start': round(self.now() if start is None else start, 3),
+        }
+        if attrs:
+            record['attrs'] = attrs
+        self.spans.append(record)
+        self.stack.append(record)
+        return record
+
+    def close(self, record):
+        if record is None:
+            return
+        record['duration'] = round(self.now() - record['start'], 3)
+        while self.stack and self.stack.pop() is not record:
+            pass
+
+
+def current():
+    """Трасса запроса, обрабатываемого в этом потоке, или None."""
+    return getattr(_local, 'trace', None)
+
+
+class span:
+    """Интервал трассы текущего запроса: with span('name', key=value)."""
+    __slots__ = ('name', 'attrs', 'trace', 'record')
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.trace = current()
+        if self.trace is not None:
+            self.record = self.trace.open(self.name, self.attrs)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.trace is not None:
+            self.trace.close(self.record)
+
+
+def traced(name):
+    """Декоратор: каждый вызов функции — интервал трассы."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if current() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def read_traces(path):
+    return jsonl.read(path, settings.TRACING_BACKUPS)
+
+
+class TracingMiddleware:
+    def __init__(self, get_response):
+        if not settings.TRACING_FILE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace = _local.trace = Trace()
+        started = timezone.now()
+        root = trace.open('request', {})
+        try:
+            with connection.execute_wrapper(self.trace_query):
+                response = self.get_response(request)
+        finally:
+            _local.trace = None
+        trace.close(root)
+        duration = root['duration'] / 1000
+        if duration >= settings.TRACING_SLOW or response.status_code >= 500:
+            match = request.resolver_match
+            jsonl.append(settings.TRACING_FILE, {
+                'trace_id': uuid.uuid4().hex,
+                'started': started.isoformat(),
+                'duration': root['duration'],
+                'method': request.method,
+                'path': request.get_full_path(),
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'dropped': trace.dropped,
+                'spans': trace.spans,
+            }, settings.TRACING_MAX_BYTES, settings.TRACING_BACKUPS)
+        return response
+
+    @staticmethod
+    def trace_query(execute, sql, params, many, context):
+        with span('sql', sql=sql[:SQL_LENGTH]):
+            return execute(sql, params, many, context)
+
+
+class ViewTracingMiddleware:
+    """
+    Интервалы resolve и view. Должен стоять последним в MIDDLEWARE,
+    чтобы между его вызовом и process_view был только разбор URL.
+    """
+
+    def __init__(self, get_response):
+        if not settings.TRACING_FILE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace = current()
+        if trace is None:
+            return self.get_response(request)
+        request.trace_resolve_start = trace.now()
+        response = self.get_response(request)
+        trace.close(getattr(request, 'trace_view_span', None))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        trace = current()
+        if trace is None:
+            return None
+        trace.close(trace.open(
+            'resolve', {}, start=request.trace_resolve_start))
+        request.trace_view_span = trace.open(
+            'view', {'view': request.resolver_match.view_name})
+        return None
@@ -1,21 +1,55 @@
 from django.contrib import admin
 
-from .models import Group, Post
+from core.admin import ScaledModelAdmin
 
+from .models import Comment, Follow, Group, Post, search_query
 
-class PostAdmin(admin.ModelAdmin):
+
+class PostAdmin(ScaledModelAdmin):
     list_display = ("pk", "text", "pub_date", "author", "group")
+    list_select_related = ("author", "group")
     search_fields = ("text",)
     list_filter = ("pub_date",)
+    date_hierarchy = "pub_date"
+    autocomplete_fields = ("author", "group")
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице.
+        query = search_query(search_term)
+        if not query:
+            return queryset, False
+        return queryset.filter(search__text__match=query), False
+
 
 admin.site.register(Post, PostAdmin)
 
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("title", "slug", "description")
+    search_fields = ("title", "slug")
     empty_value_display = "-пусто-"
 
 
 admin.site.register(Group, GroupAdmin)
+
+
+class CommentAdmin(ScaledModelAdmin):
+    list_display = ("pk", "text", "created", "author", "post")
+    list_select_related = ("author", "post")
+    # По created нет индекса, а pk растёт вместе с датой.
+    ordering = ("-pk",)
+    autocomplete_fields = ("author", "post")
+    empty_value_display = "-пусто-"
+
+
+admin.site.register(Comment, CommentAdmin)
+
+
+class FollowAdmin(ScaledModelAdmin):
+    list_display = ("pk", "user", "author")
+    list_select_related = ("user", "author")
+    autocomplete_fields = ("user", "author")
+
+
+admin.site.register(Follow, FollowAdmin)
@@ -0,0 +1,199 @@
+import hashlib
+import math
+import random
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+from core import metrics
+
+GENERATION_KEY = 'feed-generation:{}'
+PAGE_KEY = 'feed-page:{}'
+LOCK_TIMEOUT = 30
+
+# Счётчики текущего процесса: hit — свежая запись, miss — запись
+# построена заново, stale — отдана устаревшая, пока её строит другой.
+stats = Counter()
+
+
+def count(result):
+    stats[result] += 1
+    metrics.count_cache(result)
+
+
+def _initial_generation():
+    # Если счётчик вытеснен из кэша, новое значение всё равно больше
+    # всех прежних, и старые страницы не оживут.
+    return int(time.time() * 1000)
+
+
+def generations(scopes):
+    """Текущие номера поколений для списка областей кэша."""
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_generation(), None)
+            found[key] = cache.get(key, _initial_generation())
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Делает устаревшими все закэшированные страницы областей."""
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+
+
+def get_or_build(key, build, timeout, version=None, beta=1.0):
+    """То же, что get_versioned, но только значение."""
+    return get_versioned(key, build, timeout, version, beta)[0]
+
+
+def get_versioned(key, build, timeout, version=None, beta=1.0):
+    """
+    Значение из кэша, защищённое от одновременной перестройки.
+
+    Запись хранится вдвое дольше timeout. Когда она устарела по времени
+    или по version, перестраивает её только запрос, взявший блокировку,
+    остальные получают прежнее значение. Незадолго до истечения запись
+    с вероятностью, растущей с временем построения, перестраивается
+    заранее (probabilistic early expiration). Если build() вернул None,
+    значение не сохраняется. Возвращает значение и version, с которой
+    оно было построено: у устаревшего значения она прежняя.
+    """
+    now = time.time()
+    entry = cache.get(key)
+    lock = f'{key}:lock'
+    locked = False
+    if entry is not None:
+        entry_version, value, expires, delta = entry
+        early = delta * beta * math.log(1 - random.random())
+        if entry_version == version and now - early < expires:
+            count('hit')
+            return value, entry_version
+        locked = cache.add(lock, 1, LOCK_TIMEOUT)
+        if not locked:
+            count('stale')
+            return value, entry_version
+    count('miss')
+    try:
+        value = build()
+        if value is not None:
+            finished = time.time()
+            cache.set(
+                key, (version, value, finished + timeout, finished - now),
+                timeout * 2)
+    finally:
+        if locked:
+            cache.delete(lock)
+    return value, version
+
+
+def cache_feed(*scopes):
+    """
+    Кэширует страницу ленты, пока не изменится её содержимое.
+
+    Области задаются шаблонами с именованными аргументами view, например
+    'group:{slug}'. Запись страницы помечена номерами поколений областей,
+    поэтому после bump() она устаревает и перестраивается одним запросом.
+    Область 'groups' сбрасывается при изменении и удалении любой группы,
+    её указывают все страницы, где выводятся группы. Страница общая для
+    всех пользователей: персональные фрагменты выводятся через {% hole %}
+    и подставляются при ответе.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            names = [scope.format(**kwargs) for scope in scopes]
+            current = generations(names)
+            versions = ':'.join(map(str, current))
+            url = hashlib.md5(
+                request.get_full_path().encode()).hexdigest()
+            response = None
+
+            def build():
+                nonlocal response
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    return response.content, response['Content-Type']
+
+            cached, served = get_versioned(
+                PAGE_KEY.format(url), build, settings.FEED_CACHE_TIMEOUT,
+                version=versions)
+            if response is not None:
+                return response
+            if served != versions:
+                # Отдаётся прежняя страница, пока новую строит другой
+                # запрос: её ETag считается по её поколениям.
+                request.served_generations = dict(
+                    zip(names, map(int, served.split(':'))))
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        return wrapper
+    return decorator
+
+
+def scoped_etag(*scopes):
+    """
+    ETag по номерам поколений областей кэша.
+
+    Поколения меняются при любом изменении постов, комментариев,
+    подписок и групп в области, поэтому ETag вычисляется без запросов к
+    данным. Шаблоны областей заполняются аргументами view и user. В ETag
+    входит пользователь: страницы содержат его персональные фрагменты.
+    Если cache_feed отдал устаревшую страницу, её области берутся с
+    поколениями этой страницы (request.served_generations).
+
+    Остальное, что выводит страница (например, имена авторов), поколений
+    не меняет, поэтому ETag живёт не дольше FEED_CACHE_TIMEOUT, как и
+    закэшированная страница.
+    """
+    def etag(request, *args, **kwargs):
+        names = [scope.format(user=request.user, **kwargs)
+                 for scope in scopes]
+        served = getattr(request, 'served_generations', {})
+        versions = ':'.join(
+            str(served.get(name, generation))
+            for name, generation in zip(names, generations(names)))
+        period = int(time.time() // settings.FEED_CACHE_TIMEOUT)
+        key = (f'{versions}:{period}:{request.user.pk}:'
+               f'{request.get_full_path()}')
+        return hashlib.md5(key.encode()).hexdigest()
+    return etag
+
+
+def conditional(*scopes):
+    """
+    Отвечает 304, если у клиента текущая версия страницы.
+
+    ETag ответа пересчитывается после view, если та отдала устаревшую
+    страницу из cache_feed: иначе клиент сохранил бы старую страницу
+    с новым ETag и получал бы 304 до следующего изменения.
+    """
+    etag_func = scoped_etag(*scopes)
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if (getattr(request, 'served_generations', None)
+                    and response.has_header('ETag')):
+                response['ETag'] = quote_etag(
+                    etag_func(request, *args, **kwargs))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,40 @@
+"""
+Кэш подписок: множество id авторов, на которых подписан пользователь.
+
+Кнопка подписки и лента подписок проверяют подписку поиском в этом
+множестве, а не запросом к posts_follow. Множество хранится под номером
+поколения области following:<id> (см. caching.bump), и сигналы Follow
+сдвигают поколение сразу и ещё раз после фиксации транзакции. Запрос,
+прочитавший подписки до изменения, сохранит их под прежним поколением,
+которое уже никто не читает, поэтому устаревшее множество не живёт
+FOLLOWING_CACHE_TIMEOUT.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import caching
+from .models import Follow
+
+FOLLOWING_SCOPE = 'following:{}'
+FOLLOWING_KEY = 'following:{}:{}'
+
+
+def followed_ids(user_id):
+    """frozenset id авторов, на которых подписан пользователь."""
+    generation, = caching.generations([FOLLOWING_SCOPE.format(user_id)])
+    key = FOLLOWING_KEY.format(user_id, generation)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Follow.objects.filter(
+            user_id=user_id).values_list('author_id', flat=True))
+        cache.add(key, ids, settings.FOLLOWING_CACHE_TIMEOUT)
+    return ids
+
+
+def forget(user_id):
+    scope = FOLLOWING_SCOPE.format(user_id)
+    caching.bump(scope)
+    # Пока транзакция не зафиксирована, другой запрос может прочитать
+    # прежние подписки под новым поколением.
+    transaction.on_commit(lambda: caching.bump(scope))
@@ -0,0 +1,190 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import urls
+from posts.models import Group, Post, User
+
+# Эти адреса меняют данные при GET и исказили бы следующие замеры,
+# а add_comment — обработчик формы, своей страницы у него нет.
+SKIP = {'profile_follow', 'profile_unfollow', 'add_comment'}
+# Страницы, которые имеет смысл смотреть от имени автора поста.
+AS_AUTHOR = {'edit'}
+QUERY_STRINGS = {'search': {'q': 'кот'}}
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа, число запросов и память для страниц '
+            'posts на синтетических данных нескольких размеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000',
+            help='Числа постов через запятую; пользователей в 10 раз меньше.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не очищать кэш перед каждым запросом.')
+        parser.add_argument('--output', help='Куда записать результаты JSON.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого замера для сравнения.')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        self.repeat = options['repeat']
+        self.warm = options['warm']
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                    MEDIA_ROOT=directory, THUMBNAIL_WORKERS=0,
+                    CACHES={'default': {
+                        'BACKEND': 'core.cache.SQLiteCache',
+                        'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+                        'OPTIONS': {'MAX_ENTRIES': 100000}}}):
+                results = self.run(sizes, directory)
+        report = {'meta': self.meta(), 'results': results}
+        self.print_table(results, options['compare'])
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def run(self, sizes, directory):
+        """Замеры в отдельной файловой БД, данные наращиваются по размерам."""
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'benchmark.sqlite3')
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        results = []
+        try:
+            generated = 0
+            for size in sizes:
+                call_command(
+                    'generate_data', posts=size - generated,
+                    users=max((size - generated) // 10, 2),
+                    seed=size, stdout=self.stderr)
+                generated = size
+                results += self.measure_views(size)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        return results
+
+    def measure_views(self, size):
+        reader = User.objects.annotate(
+            follows=Count('follower')).order_by('-follows').first()
+        post = Post.objects.annotate(
+            comments_total=Count('comments')).order_by(
+            '-comments_total').select_related('author').first()
+        group = Group.objects.annotate(
+            posts_total=Count('posts')).order_by('-posts_total').first()
+        kwargs = {'username': post.author.username, 'post_id': post.pk,
+                  'slug': group.slug}
+        clients = {False: Client(), True: Client()}
+        clients[False].force_login(reader)
+        clients[True].force_login(post.author)
+        results = []
+        for pattern in urls.urlpatterns:
+            name = pattern.name
+            if name is None or name in SKIP:
+                continue
+            url = reverse(name, kwargs={
+                key: kwargs[key] for key in pattern.pattern.converters})
+            client = clients[name in AS_AUTHOR]
+            results.append({
+                'size': size, 'view': name, 'url': url,
+                **self.measure(client, url, QUERY_STRINGS.get(name))})
+        return results
+
+    def measure(self, client, url, data):
+        def request():
+            if not self.warm:
+                cache.clear()
+            return client.get(url, data)
+
+        request()
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        # Журнал запросов очищается в начале каждого запроса, поэтому
+        # число берётся сразу, до повторов.
+        query_count = len(queries)
+        timings = []
+        for _ in range(self.repeat):
+            if not self.warm:
+                cache.clear()
+            started = time.perf_counter()
+            client.get(url, data)
+            timings.append((time.perf_counter() - started) * 1000)
+        if not self.warm:
+            cache.clear()
+        tracemalloc.start()
+        client.get(url, data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {
+            'status': response.status_code,
+            'queries': query_count,
+            'bytes': len(response.content),
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def meta(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True,
+                text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'created': timezone.now().isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'repeat': self.repeat,
+            'warm': self.warm,
+        }
+
+    def print_table(self, results, compare):
+        baseline = {}
+        if compare:
+            with open(compare) as file:
+                baseline = {(row['size'], row['view']): row
+                            for row in json.load(file)['results']}
+        self.stdout.write(
+            f'{"size":>7} {"view":<16} {"status":>6} {"queries":>7} '
+            f'{"median ms":>10} {"p95 ms":>8} {"peak KB":>8} {"vs old":>7}')
+        for row in results:
+            old = baseline.get((row['size'], row['view']))
+            change = (f'{row["median_ms"] / old["median_ms"]:>6.2f}x'
+                      if old and old['median_ms'] else f'{"-":>7}')
+            self.stdout.write(
+                f'{row["size"]:>7} {row["view"]:<16} {row["status"]:>6} '
+                f'{row["queries"]:>7} {row["median_ms"]:>10.2f} '
+                f'{row["p95_ms"]:>8.2f} {row["peak_memory_kb"]:>8.1f} '
+                f'{change}')
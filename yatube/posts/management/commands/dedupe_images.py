@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import delete
+
+from posts import caching
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переносит изображения постов в хранилище по хэшу содержимого '
+            'и удаляет копии.')
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        # Один проход по постам: имена файлов и ленты, где их видно.
+        feeds = {}
+        for name, username, slug in Post.objects.exclude(image='').exclude(
+                image__isnull=True).order_by().values_list(
+                'image', 'author__username', 'group__slug'):
+            feeds.setdefault(name, set()).add((username, slug))
+        freed = moved = 0
+        blobs = {name for name in feeds if storage.is_hashed(name)}
+        scopes = set()
+        for name in sorted(feeds):
+            if storage.is_hashed(name):
+                continue
+            if not storage.exists(name):
+                self.stderr.write(f'Нет файла: {name}')
+                continue
+            with storage.open(name) as file:
+                new_name = storage.save(name, file)
+            # Посты файла находятся по индексу post_image_idx.
+            Post.objects.filter(image=name).update(
+                image=new_name, updated=timezone.now())
+            for username, slug in feeds[name]:
+                scopes.add(f'profile:{username}')
+                if slug:
+                    scopes.add(f'group:{slug}')
+            moved += 1
+            freed += storage.size(name)
+            if new_name not in blobs:
+                blobs.add(new_name)
+                freed -= storage.size(new_name)
+            # Миниатюры старых файлов sorl учитывал по стандартному
+            # хранилищу, поэтому их удаляем отдельно от самого файла.
+            delete(name, delete_file=False)
+            storage.delete(name)
+        # update() не вызывает сигналы: ленты сбрасываются один раз.
+        if scopes:
+            caching.bump('index', *scopes)
+        self.stdout.write(
+            f'Перенесено файлов: {moved}, освобождено байт: {freed}. '
+            'Миниатюры для новых имён создаст generate_thumbnails.')
@@ -0,0 +1,222 @@
+import io
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Comment, Follow, Group, Post, Timeline, User
+
+WORDS = (
+    'кот собака утро вечер город море лес поезд книга музыка кофе чай '
+    'дождь солнце зима лето весна осень работа отпуск друг семья фильм '
+    'игра код сервер ошибка релиз тест база запрос кэш страница лента'
+).split()
+
+
+@contextmanager
+def manual_dates(*fields):
+    """Позволяет задать даты с auto_now_add при bulk_create."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу пользователями, подписками, постами и '
+            'комментариями для нагрузочных замеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок пользователя.')
+        parser.add_argument(
+            '--comments', type=float, default=3,
+            help='Среднее число комментариев к посту.')
+        parser.add_argument(
+            '--images', type=float, default=0.2,
+            help='Доля постов с картинкой.')
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = f'gen{int(time.time())}'
+        started = time.perf_counter()
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            groups = self.create_groups(options['groups'])
+            self.create_follows(users, options['follows'])
+            images = self.create_images() if options['images'] else []
+            posts = self.create_posts(
+                users, groups, images, options['posts'], options['images'],
+                options['days'])
+            self.create_comments(users, posts, options['comments'])
+            self.create_timelines(posts)
+        # bulk_create не вызывает сигналы: счётчики пересчитываются
+        # отдельно, а закэшированные ленты сбрасываются целиком.
+        call_command('rebuild_user_stats', stdout=io.StringIO())
+        cache.clear()
+        self.stdout.write(
+            f'Создано: пользователей {len(users)}, постов {len(posts)}, '
+            f'подписок {Follow.objects.count()}, '
+            f'комментариев {Comment.objects.count()} '
+            f'за {time.perf_counter() - started:.1f} с')
+
+    def bulk_create(self, model, objects):
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def insert_rows(self, model, fields, rows):
+        """
+        Вставка кортежей одним executemany в обход моделей: для самых
+        больших таблиц сборка объектов и SQL в ORM дороже самой записи.
+        Даты нужно заранее привести через adapt_datetime.
+        """
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(
+            connection.ops.quote_name(model._meta.get_field(field).column)
+            for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        insert = connection.ops.insert_statement(ignore_conflicts=True)
+        sql = f'{insert} {table} ({columns}) VALUES ({placeholders})'
+        with connection.cursor() as cursor:
+            for batch in batched(rows, self.batch_size):
+                cursor.executemany(sql, batch)
+
+    def adapt_datetime(self, value):
+        return connection.ops.adapt_datetimefield_value(value)
+
+    def create_users(self, count):
+        password = make_password('password')
+        self.bulk_create(User, (
+            User(username=f'{self.prefix}_{number}', password=password)
+            for number in range(count)))
+        return list(User.objects.filter(
+            username__startswith=f'{self.prefix}_').values_list(
+            'pk', flat=True))
+
+    def create_groups(self, count):
+        self.bulk_create(Group, (
+            Group(title=f'Сообщество {number}',
+                  slug=f'{self.prefix}-{number}',
+                  description=self.sentence(20))
+            for number in range(count)))
+        return list(Group.objects.filter(
+            slug__startswith=f'{self.prefix}-').values_list('pk', flat=True))
+
+    def create_follows(self, users, average):
+        """
+        Подписки со степенным распределением популярности авторов:
+        вес автора обратно пропорционален его месту в рейтинге.
+        """
+        authors = users[:]
+        self.random.shuffle(authors)
+        weights = [1 / rank for rank in range(1, len(authors) + 1)]
+        follows = []
+        for user in users:
+            count = min(int(self.random.expovariate(1 / average)),
+                        len(authors) - 1)
+            chosen = set(self.random.choices(authors, weights, k=count))
+            chosen.discard(user)
+            follows.extend((user, author) for author in chosen)
+        self.insert_rows(Follow, ('user', 'author'), follows)
+        self.popular = authors
+
+    def create_images(self, count=20):
+        storage = Post._meta.get_field('image').storage
+        names = []
+        for number in range(count):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', (1200, 800), color).save(buffer, 'JPEG')
+            name = storage.save(
+                f'posts/{number}.jpg', ContentFile(buffer.getvalue()))
+            thumbnails.create(Post(image=name).image)
+            names.append(name)
+        return names
+
+    def create_posts(self, users, groups, images, count, with_images, days):
+        # Популярные авторы пишут чаще.
+        weights = [1 / rank ** 0.5 for rank in range(1, len(users) + 1)]
+        authors = self.random.choices(self.popular, weights, k=count)
+        start = timezone.now() - timedelta(days=days)
+        step = timedelta(days=days) / max(count, 1)
+        with manual_dates(Post._meta.get_field('pub_date')):
+            self.bulk_create(Post, (
+                Post(text=self.sentence(self.random.randint(5, 60)),
+                     author_id=author,
+                     group_id=(self.random.choice(groups)
+                               if groups and self.random.random() < 0.5
+                               else None),
+                     image=(self.random.choice(images)
+                            if images and self.random.random() < with_images
+                            else None),
+                     pub_date=start + step * number)
+                for number, author in enumerate(authors)))
+        return list(Post.objects.filter(author_id__in=users).values_list(
+            'pk', 'author_id', 'pub_date'))
+
+    def create_comments(self, users, posts, average):
+        def comments():
+            for pk, _, pub_date in posts:
+                # Немногие посты собирают большую часть комментариев.
+                count = int(self.random.paretovariate(1.5) * average / 3)
+                for number in range(count):
+                    yield (pk, self.random.choice(users),
+                           self.sentence(self.random.randint(3, 30)),
+                           self.adapt_datetime(
+                               pub_date + timedelta(minutes=number + 1)))
+
+        self.insert_rows(
+            Comment, ('post', 'author', 'text', 'created'), comments())
+
+    def create_timelines(self, posts):
+        """Раскладывает посты по лентам так же, как timeline.fan_out."""
+        followers = {}
+        for user, author in Follow.objects.values_list('user_id', 'author_id'):
+            followers.setdefault(author, []).append(user)
+        limit = settings.TIMELINE_FANOUT_LIMIT
+
+        def rows():
+            for pk, author, pub_date in posts:
+                users = followers.get(author, ())
+                if len(users) > limit:
+                    continue
+                pub_date = self.adapt_datetime(pub_date)
+                for user in users:
+                    yield user, pk, pub_date
+
+        self.insert_rows(Timeline, ('user', 'post', 'pub_date'), rows())
+
+    def sentence(self, length):
+        return ' '.join(self.random.choices(WORDS, k=length)).capitalize()
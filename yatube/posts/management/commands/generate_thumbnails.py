@@ -0,0 +1,39 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+def generate_in_worker(name):
+    try:
+        generate(name)
+    finally:
+        connections.close_all()
+    return name
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры всех изображений постов на всех ядрах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Сколько процессов создают миниатюры.')
+
+    def handle(self, *args, **options):
+        names = list(Post.objects.exclude(image='').order_by(
+            'image').values_list('image', flat=True).distinct())
+        # Дочерние процессы не должны разделять соединение родителя.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(options['workers'], context) as pool:
+            for done, _ in enumerate(
+                    pool.map(generate_in_worker, names), start=1):
+                if done % 100 == 0:
+                    self.stdout.write(f'Обработано изображений: {done}')
+        self.stdout.write(f'Обработано изображений: {len(names)}')
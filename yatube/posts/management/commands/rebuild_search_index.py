@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import PostIndex
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов по таблице постов.'
+
+    def handle(self, *args, **options):
+        table = connection.ops.quote_name(PostIndex._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+        self.stdout.write(
+            f'Проиндексировано постов: {PostIndex.objects.count()}')
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Follow, Post, User, UserStats
+
+
+def count_by(queryset, field, ids):
+    return dict(queryset.filter(**{f'{field}__in': ids}).order_by(
+    ).values_list(field).annotate(Count('pk')))
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики записей и подписок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько пользователей пересчитывать за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        limit = settings.TIMELINE_FANOUT_LIMIT
+        last_pk = 0
+        total = 0
+        while True:
+            ids = list(User.objects.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            posts = count_by(Post.objects, 'author_id', ids)
+            followers = count_by(Follow.objects, 'author_id', ids)
+            following = count_by(Follow.objects, 'user_id', ids)
+            with transaction.atomic():
+                # Пропуски раскладки по лентам не пересчитать: отметка
+                # сохраняется, а у авторов с большой аудиторией ставится.
+                incomplete = set(UserStats.objects.filter(
+                    user_id__in=ids, fan_out_incomplete=True,
+                ).values_list('user_id', flat=True))
+                UserStats.objects.filter(user_id__in=ids).delete()
+                UserStats.objects.bulk_create(
+                    UserStats(user_id=pk,
+                              posts_count=posts.get(pk, 0),
+                              followers_count=followers.get(pk, 0),
+                              following_count=following.get(pk, 0),
+                              fan_out_incomplete=(
+                                  pk in incomplete
+                                  or followers.get(pk, 0) > limit))
+                    for pk in ids)
+            last_pk = ids[-1]
+            total += len(ids)
+        self.stdout.write(f'Пересчитано пользователей: {total}')
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.6 on 2026-10-17 04:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_user_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    posts = dict(Post.objects.order_by().values_list(
+        'author_id').annotate(Count('pk')))
+    followers = dict(Follow.objects.order_by().values_list(
+        'author_id').annotate(Count('pk')))
+    following = dict(Follow.objects.order_by().values_list(
+        'user_id').annotate(Count('pk')))
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk,
+                   posts_count=posts.get(pk, 0),
+                   followers_count=followers.get(pk, 0),
+                   following_count=following.get(pk, 0))
+         for pk in User.objects.values_list('pk', flat=True).iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0012_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='записей')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='подписок')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow_list'),
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
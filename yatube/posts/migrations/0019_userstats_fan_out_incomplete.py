@@ -0,0 +1,27 @@
+# Generated by Django 2.2.6 on 2026-10-17 04:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_large_audiences(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).update(fan_out_incomplete=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='fan_out_incomplete',
+            field=models.BooleanField(default=False, verbose_name='ленты подписчиков неполные'),
+        ),
+        migrations.RunPython(mark_large_audiences, migrations.RunPython.noop),
+    ]
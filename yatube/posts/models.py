@@ -1,9 +1,52 @@
+import re
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import (FloatField, IntegerField, Lookup, OuterRef,
+                              Subquery, Value)
+from django.db.models.expressions import RawSQL
+
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
 
+class SubqueryCount(Subquery):
+    """Коррелированный подзапрос, возвращающий число строк."""
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _count)'
+    output_field = IntegerField()
+    contains_aggregate = False
+
+
+class Match(Lookup):
+    """Полнотекстовое условие FTS5: колонка MATCH запрос."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class SearchField(models.TextField):
+    """Колонка полнотекстового индекса, поддерживает lookup match."""
+
+
+SearchField.register_lookup(Match)
+
+
+def search_query(text):
+    """
+    Запрос FTS5 из строки пользователя: все слова обязательны,
+    последнее ищется и как начало слова. Синтаксис FTS5 (кавычки,
+    AND, NEAR и т. п.) экранируется. Пустая строка — если слов нет.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
@@ -13,6 +56,54 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """
+        Посты для лент: автор и группа подтягиваются одним запросом,
+        число комментариев считается подзапросом.
+        """
+        comments = Comment.objects.filter(
+            post=OuterRef('pk')).order_by().values('pk')
+        return self.select_related('author', 'group').annotate(
+            comments_count=SubqueryCount(comments)).order_by('-pub_date')
+
+    def search(self, text):
+        """
+        Посты, подходящие под поисковую строку, от самых релевантных.
+
+        Поиск идёт по индексу FTS5 posts_post_search, релевантность
+        score — это bm25 с обратным знаком, чтобы больше было лучше.
+        """
+        query = search_query(text)
+        if not query:
+            return self.none().annotate(
+                score=Value(0, output_field=FloatField()))
+        return self.filter(search__text__match=query).annotate(
+            score=RawSQL('-bm25(posts_post_search)', (),
+                         output_field=FloatField())).order_by(
+            '-score', '-pk')
+
+    def count(self):
+        # Число комментариев и релевантность нужны только для
+        # отображения, но с любой аннотацией Django 2.2 считает COUNT(*)
+        # по подзапросу и вычисляет их для каждой строки, а bm25() в
+        # подзапросе SQLite не разрешает вовсе. Остальные аннотации
+        # могут участвовать в фильтрах и группировке, поэтому убираются
+        # только эти две.
+        query = self.query
+        display = {'comments_count', 'score'} & set(query.annotations)
+        if (self._result_cache is not None or not display
+                or query.group_by is not None):
+            return super().count()
+        clone = self._chain()
+        for name in display:
+            del clone.query.annotations[name]
+        if clone.query.annotation_select_mask is not None:
+            clone.query.set_annotation_mask(
+                clone.query.annotation_select_mask - display)
+        return clone.query.get_count(using=self.db)
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст',
@@ -29,14 +120,53 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Изображение',
         help_text='Загрузите изображение или просто перетащите файл',
-        upload_to='posts/', blank=True, null=True)
+        upload_to='posts/', storage=ContentAddressedStorage(),
+        blank=True, null=True)
+    updated = models.DateTimeField('date updated', auto_now=True)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты группы и автора: выборка и сортировка по одному индексу.
+        indexes = [
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_feed_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_feed_idx'),
+            # Одно изображение из хранилища по хэшу может быть у многих
+            # постов: по индексу находятся все посты файла.
+            models.Index(fields=('image',), name='post_image_idx')]
 
     def __str__(self):
         return self.text
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Группа на момент загрузки: при переносе поста в другую группу
+        # нужно сбросить кэш обеих групп.
+        instance._loaded_group_id = dict(
+            zip(field_names, values)).get('group_id')
+        return instance
+
+
+class PostIndex(models.Model):
+    """
+    Виртуальная таблица FTS5 с текстами постов.
+
+    Таблицу и триггеры, которые обновляют её при изменении posts_post,
+    создаёт миграция; rowid таблицы совпадает с id поста.
+    """
+    post = models.OneToOneField(
+        Post, on_delete=models.DO_NOTHING, primary_key=True,
+        db_column='rowid', related_name='search')
+    text = SearchField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_search'
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -49,6 +179,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=('post', '-created', '-id'),
+                         name='comment_post_created_idx')]
 
     def __str__(self):
         return self.text
@@ -64,3 +197,37 @@ class Follow(models.Model):
         constraints = [
             models.UniqueConstraint(fields=('user', 'author'),
                                     name='unique_follow_list')]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='stats')
+    posts_count = models.PositiveIntegerField('записей', default=0)
+    followers_count = models.PositiveIntegerField('подписчиков', default=0)
+    following_count = models.PositiveIntegerField('подписок', default=0)
+    # Посты автора пропускались при раскладке по лентам подписчиков
+    # (см. posts.timeline), лента добирает их при чтении.
+    fan_out_incomplete = models.BooleanField(
+        'ленты подписчиков неполные', default=False)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count}/{self.followers_count}'
+
+
+class Timeline(models.Model):
+    """Лента подписок пользователя, заполняемая при публикации поста."""
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='timeline',
+        db_index=False)
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name='timeline')
+    pub_date = models.DateTimeField('date published')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_timeline_post')]
+        indexes = [
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='timeline_user_feed_idx')]
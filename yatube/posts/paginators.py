@@ -0,0 +1,115 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorPaginator(Paginator):
+    """
+    Постраничный вывод по ключу сортировки (keyset pagination).
+
+    Вместо COUNT(*) и OFFSET страница выбирается условием «строго после
+    курсора» по убыванию полей keys, поэтому любая страница стоит
+    одинаково. Курсор — непрозрачная строка для параметра ?cursor=.
+    Записи могут быть объектами или словарями из values().
+    lookups позволяет фильтровать и сортировать по другим колонкам,
+    чем те, из которых берутся значения курсора.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'pk'),
+                 lookups=None):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.lookups = lookups or keys
+
+    def encode_cursor(self, obj, direction):
+        values = [direction]
+        for key in self.keys:
+            value = obj[key] if isinstance(obj, dict) else getattr(obj, key)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        data = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, значения) или None для битого курсора."""
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, *values = json.loads(data.decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            return None
+        if direction not in (NEXT, PREVIOUS) or (
+                len(values) != len(self.lookups)):
+            return None
+        try:
+            values = [self._field(lookup).to_python(value)
+                      for lookup, value in zip(self.lookups, values)]
+        except (ValidationError, TypeError, ValueError):
+            return None
+        return direction, values
+
+    def _field(self, lookup):
+        """Поле модели или аннотации, по которому сортирует lookup."""
+        query = self.object_list.query
+        if lookup in query.annotations:
+            return query.annotations[lookup].output_field
+        opts = self.object_list.model._meta
+        return opts.pk if lookup == 'pk' else opts.get_field(lookup)
+
+    def _after(self, values, direction):
+        """Условие «строго после курсора» для составного ключа."""
+        op = 'lt' if direction == NEXT else 'gt'
+        condition = Q()
+        equal = {}
+        for lookup, value in zip(self.lookups, values):
+            condition |= Q(**equal, **{f'{lookup}__{op}': value})
+            equal[lookup] = value
+        return condition
+
+    def get_cursor_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        direction, values = decoded or (NEXT, None)
+        if direction == NEXT:
+            ordering = [f'-{lookup}' for lookup in self.lookups]
+        else:
+            ordering = list(self.lookups)
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, direction))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            if not has_more:
+                # Дошли до начала ленты: показываем её первую страницу.
+                return self.get_cursor_page()
+            rows.reverse()
+        page = self._get_page(rows, 1, self)
+        page.next_cursor = page.previous_cursor = None
+        if rows and (has_more or direction == PREVIOUS):
+            page.next_cursor = self.encode_cursor(rows[-1], NEXT)
+        if rows and values is not None:
+            page.previous_cursor = self.encode_cursor(rows[0], PREVIOUS)
+        return page
+
+
+def paginate(request, queryset, **kwargs):
+    """
+    Страница ленты: по ?page= — обычный Paginator со счётчиком страниц,
+    иначе — по курсору из ?cursor=.
+    """
+    if 'page' in request.GET:
+        paginator = Paginator(queryset, settings.POSTS_LIMIT)
+        return paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(queryset, settings.POSTS_LIMIT, **kwargs)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
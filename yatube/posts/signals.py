@@ -0,0 +1,109 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching, following, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def update_stats(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на заданные величины."""
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()})
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        update_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    update_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        update_stats(instance.author_id, followers_count=1)
+        update_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    update_stats(instance.author_id, followers_count=-1)
+    update_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_following(sender, instance, raw=False, **kwargs):
+    if not raw:
+        following.forget(instance.user_id)
+
+
+def post_scopes(post):
+    """Области кэша лент, в которых показывается пост."""
+    scopes = ['index', f'profile:{post.author.username}']
+    group_ids = {post.group_id, getattr(post, '_loaded_group_id', None)}
+    scopes.extend(
+        f'group:{slug}' for slug in Group.objects.filter(
+            pk__in=group_ids - {None}).values_list('slug', flat=True))
+    return scopes
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump(*post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump(*post_scopes(instance.post))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, raw=False, **kwargs):
+    if not raw:
+        usernames = User.objects.filter(
+            pk__in=(instance.user_id, instance.author_id)
+        ).values_list('username', flat=True)
+        caching.bump(*(f'profile:{username}' for username in usernames))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, raw=False, **kwargs):
+    # Название и ссылка группы выводятся в карточках всех лент, а при
+    # удалении посты теряют группу через SET_NULL без своих сигналов.
+    if not raw:
+        caching.bump('groups', f'group:{instance.slug}')
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}(\.\w+)?$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла — хэш его содержимого.
+
+    Файл из upload_to='posts/' сохраняется как posts/ab/abcd….gif.
+    Одинаковые загрузки получают одно имя, поэтому на диске лежит
+    одна копия, а sorl-thumbnail делает для неё один набор миниатюр.
+    Хэш считается во время записи, файл не читается повторно.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory, basename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(basename)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        fd, temporary = tempfile.mkstemp(
+            dir=self.path(directory), suffix='.part')
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    file.write(chunk)
+            digest = digest.hexdigest()
+            name = posixpath.join(directory, digest[:2], digest + extension)
+            if not self.exists(name):
+                os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary, self.file_permissions_mode)
+                # Переименование атомарно: параллельная загрузка того же
+                # файла просто заменит его такой же копией.
+                os.replace(temporary, self.path(name))
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return name
+
+    def is_hashed(self, name):
+        return bool(HASHED_NAME.search(name))
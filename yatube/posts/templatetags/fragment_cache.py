@@ -0,0 +1,39 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from ..caching import get_or_build
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.name, vary_on)
+        return get_or_build(
+            key, lambda: self.nodelist.render(context), int(timeout))
+
+
+@register.tag
+def fragment_cache(parser, token):
+    """
+    Как {% cache %}, но устаревший фрагмент перестраивает один запрос:
+
+        {% fragment_cache 600 post_card post.id %} ... {% endfragment_cache %}
+    """
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 2 arguments.")
+    return FragmentCacheNode(
+        nodelist, parser.compile_filter(bits[1]), bits[2],
+        [parser.compile_filter(bit) for bit in bits[3:]])
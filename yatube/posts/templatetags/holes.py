@@ -0,0 +1,16 @@
+from django import template
+
+from ..holes import make_hole
+from ..following import followed_ids
+
+register = template.Library()
+
+
+@register.simple_tag
+def hole(template_name, **context):
+    return make_hole(template_name, **context)
+
+
+@register.simple_tag
+def follows(user, author_id):
+    return user.is_authenticated and author_id in followed_ids(user.pk)
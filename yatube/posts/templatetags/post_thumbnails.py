@@ -0,0 +1,28 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, size):
+    """
+    Готовая миниатюра изображения или None.
+
+    Если миниатюры ещё нет, она ставится в очередь на создание,
+    а шаблон показывает исходное изображение.
+    """
+    if not image:
+        return None
+    thumbnail = thumbnails.lookup(image, size)
+    if thumbnail is None:
+        thumbnails.schedule(image.name)
+    return thumbnail
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, size):
+    """Миниатюры всех постов страницы одним запросом перед карточками."""
+    thumbnails.prefetch([post.image for post in posts], size)
+    return ''
@@ -0,0 +1,42 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ScaledAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        group = Group.objects.create(title='Группа', slug='group')
+        for number in range(5):
+            author = User.objects.create_user(username=f'author{number}')
+            post = Post.objects.create(
+                text=f'Пост {number}', author=author, group=group)
+            Comment.objects.create(post=post, author=author, text='Ответ')
+            Follow.objects.create(user=cls.admin, author=author)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries_do_not_depend_on_rows(self):
+        """Список не делает запросов на каждую строку."""
+        # Сессия, пользователь, число строк и сами строки; для постов ещё
+        # границы дат и годы в date_hierarchy.
+        expected = {'post': 6, 'comment': 4, 'follow': 4}
+        for model, queries in expected.items():
+            url = reverse(f'admin:posts_{model}_changelist')
+            with self.subTest(model=model):
+                self.client.get(url)
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_change_form_does_not_list_users(self):
+        """Автор выбирается через autocomplete, а не из всех пользователей."""
+        post = Post.objects.get(author__username='author4')
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=(post.pk,)))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'author0</option>')
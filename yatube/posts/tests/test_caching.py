@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from .. import caching
+
+
+class GetOrBuildTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        caching.stats.clear()
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return f'value {self.builds}'
+
+    def test_fresh_value_is_built_once(self):
+        """Свежее значение берётся из кэша."""
+        for _ in range(3):
+            value = caching.get_or_build('key', self.build, 60, version=1)
+        self.assertEqual(value, 'value 1')
+        self.assertEqual(caching.stats, {'miss': 1, 'hit': 2})
+
+    def test_stale_value_served_while_locked(self):
+        """Пока запись перестраивает другой запрос, отдаётся старая."""
+        caching.get_or_build('key', self.build, 60, version=1)
+        cache.add('key:lock', 1)
+        value = caching.get_or_build('key', self.build, 60, version=2)
+        self.assertEqual(value, 'value 1')
+        self.assertEqual(caching.stats['stale'], 1)
+        cache.delete('key:lock')
+        value = caching.get_or_build('key', self.build, 60, version=2)
+        self.assertEqual(value, 'value 2')
+        self.assertFalse(cache.has_key('key:lock'))
+
+    def test_expired_value_is_rebuilt(self):
+        """Запись, истёкшая по времени, перестраивается."""
+        caching.get_or_build('key', self.build, 60)
+        with mock.patch('time.time', return_value=caching.time.time() + 61):
+            value = caching.get_or_build('key', self.build, 60)
+        self.assertEqual(value, 'value 2')
+
+    def test_none_is_not_cached(self):
+        """Результат None не сохраняется."""
+        caching.get_or_build('key', lambda: None, 60)
+        self.assertIsNone(cache.get('key'))
+
+    def test_fragment_cache_tag(self):
+        """Тег fragment_cache кэширует фрагмент по имени и аргументам."""
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% fragment_cache 60 card id %}{{ text }}{% endfragment_cache %}')
+
+        def render(**context):
+            return template.render(Context(context))
+
+        self.assertEqual(render(id=1, text='первый'), 'первый')
+        self.assertEqual(render(id=1, text='второй'), 'первый')
+        self.assertEqual(render(id=2, text='второй'), 'второй')
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -61,11 +62,12 @@ class PostCreateFormTests(TestCase):
             follow=True
         )
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text=form_data['text'],
                 group=self.group.id,
-                image='posts/small.gif',
+                image=f'posts/{digest[:2]}/{digest}.gif',
             ).first())
 
     def test_edit_post(self):
@@ -0,0 +1,39 @@
+import base64
+import json
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase
+
+from ..holes import fill_holes, make_hole
+
+
+def payload(template_name, **context):
+    data = json.dumps([template_name, context], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+class HoleTests(SimpleTestCase):
+    def test_hole_is_filled(self):
+        """Метка из {% hole %} заменяется отрисованным фрагментом."""
+        content = f'<p>{make_hole("includes/menu.html")}</p>'
+        self.assertNotIn('<!--hole:', fill_holes(content, AnonymousUser()))
+
+    def test_hole_does_not_depend_on_time(self):
+        """Одни и те же данные дают одну метку в любой момент."""
+        holes = []
+        for now in (1000, 2000):
+            with mock.patch('time.time', return_value=now):
+                holes.append(make_hole('includes/menu.html', b=1, a=2))
+        self.assertEqual(holes[0], holes[1])
+        self.assertEqual(
+            make_hole('includes/menu.html', a=2, b=1), holes[0])
+
+    def test_forged_hole_is_not_rendered(self):
+        """Метка без верной подписи не выбирает шаблон."""
+        signature = str(make_hole('includes/menu.html')).split(':')[-1]
+        forged = payload('includes/nav.html')
+        for marker in (f'<!--hole:{forged}-->',
+                       f'<!--hole:{forged}:{signature}'):
+            with self.subTest(marker=marker):
+                self.assertEqual(fill_holes(marker, AnonymousUser()), marker)
@@ -1,7 +1,14 @@
 # deals/tests/tests_models.py
-from django.test import TestCase
+from io import StringIO
 
-from ..models import Group, Post, User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User, UserStats
 
 
 class PostModelTest(TestCase):
@@ -20,6 +27,31 @@ class PostModelTest(TestCase):
         self.assertEqual(expected, self.post.text[:15])
 
 
+class PostCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='TestUser')
+        posts = [Post.objects.create(text=str(number), author=user)
+                 for number in range(3)]
+        Comment.objects.create(post=posts[0], author=user, text='Первый')
+        Comment.objects.create(post=posts[0], author=user, text='Второй')
+
+    def test_feed_count_skips_comments(self):
+        """Число постов ленты считается без подсчёта комментариев."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(Post.objects.feed().count(), 3)
+        self.assertNotIn('posts_comment', queries[0]['sql'])
+
+    def test_count_keeps_other_annotations(self):
+        """Фильтры и группировка по другим аннотациям учитываются."""
+        commented = Post.objects.feed().annotate(
+            comments_total=Count('comments')).filter(comments_total__gt=0)
+        self.assertEqual(commented.count(), 1)
+        self.assertEqual(
+            Post.objects.feed().values('comments_count').annotate(
+                posts=Count('pk')).count(), 2)
+
+
 class GroupModelTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -33,3 +65,70 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         expected = group.title
         self.assertEqual(expected, self.group.title)
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='Author')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertStats(self, user, posts, followers, following):
+        stats = UserStats.objects.get(user=user)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count, stats.following_count),
+            (posts, followers, following))
+
+    def test_stats_follow_posts_and_subscriptions(self):
+        """Счётчики меняются при создании и удалении постов и подписок."""
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': self.author}))
+        self.assertStats(self.author, posts=1, followers=1, following=0)
+        self.assertStats(self.user, posts=0, followers=0, following=1)
+        post.delete()
+        self.authorized_client.get(
+            reverse('profile_unfollow', kwargs={'username': self.author}))
+        self.assertStats(self.author, posts=0, followers=0, following=0)
+        self.assertStats(self.user, posts=0, followers=0, following=0)
+
+    def test_rebuild_user_stats(self):
+        """Команда rebuild_user_stats восстанавливает счётчики."""
+        Post.objects.create(text='Тестовый текст', author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        UserStats.objects.all().delete()
+        call_command('rebuild_user_stats', batch_size=1, stdout=StringIO())
+        self.assertStats(self.author, posts=1, followers=1, following=0)
+        self.assertStats(self.user, posts=0, followers=0, following=1)
+
+    def test_rebuild_user_stats_keeps_fan_out_marks(self):
+        """Отметка о пропущенной раскладке по лентам не теряется."""
+        UserStats.objects.filter(user=self.author).update(
+            fan_out_incomplete=True)
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertTrue(UserStats.objects.get(
+            user=self.author).fan_out_incomplete)
+        self.assertFalse(UserStats.objects.get(
+            user=self.user).fan_out_incomplete)
+
+
+class GenerateDataTest(TestCase):
+    def test_generate_data(self):
+        """Сгенерированные посты разложены по лентам, счётчики посчитаны."""
+        call_command(
+            'generate_data', users=20, posts=100, groups=2, images=0,
+            stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 100)
+        for post in Post.objects.all()[:10]:
+            self.assertEqual(
+                set(post.timeline.values_list('user', flat=True)),
+                set(Follow.objects.filter(author=post.author_id).values_list(
+                    'user', flat=True)))
+        author = Post.objects.first().author
+        self.assertEqual(
+            author.stats.posts_count, author.posts.count())
@@ -0,0 +1,155 @@
+import re
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.slow_queries import explain, full_scans
+
+from .. import thumbnails, urls
+from ..models import Comment, Follow, Group, Post, PostQuerySet, User
+
+TABLES = ['posts_post', 'posts_comment', 'posts_follow', 'posts_timeline']
+
+
+@override_settings(SLOW_QUERY_TABLES=TABLES)
+class QueryPlanTests(TestCase):
+    """
+    Запросы страниц posts идут по индексам: без полного просмотра
+    таблиц и без сортировки во временном B-дереве.
+    """
+    # Где это ожидаемо: общая лента обходит индекс pub_date целиком
+    # (с LIMIT), а число всех постов для ?page= SQLite считает по самому
+    # узкому индексу; поиск сортирует найденное по релевантности. Шаг
+    # плана должен совпасть с шаблоном полностью, вместе с индексом.
+    ALLOWED = {
+        'index': {
+            r'SCAN posts_post USING INDEX posts_post_pub_date_\w+',
+            r'SCAN posts_post USING COVERING INDEX \w+',
+        },
+        'search': {'TEMP B-TREE'},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(int(settings.POSTS_LIMIT) + 1):
+            post = Post.objects.create(
+                text=f'Текст поста {number}', author=cls.author,
+                group=cls.group)
+        cls.post = post
+        for number in range(settings.COMMENTS_LIMIT + 1):
+            Comment.objects.create(
+                post=post, author=cls.user, text=f'Комментарий {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.visited = set()
+
+    def problems(self, method, url, data=None):
+        """Шаги планов запросов страницы, которые не прошли проверку."""
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = getattr(self.client, method)(url, data)
+        view_name = response.resolver_match.view_name
+        self.visited.add(view_name)
+        allowed = self.ALLOWED.get(view_name, set())
+        found = []
+        for sql, params in queries:
+            plan = explain(connection, sql, params) or []
+            # Старые версии SQLite пишут SCAN TABLE вместо SCAN.
+            steps = [step.replace('SCAN TABLE ', 'SCAN ', 1)
+                     for step in plan if full_scans([step])]
+            steps += ['TEMP B-TREE' for step in plan if 'TEMP B-TREE' in step]
+            if any(not any(re.fullmatch(pattern, step) for pattern in allowed)
+                   for step in steps):
+                found.append((sql, plan))
+        return response, found
+
+    def assertIndexed(self, method, url, data=None):
+        with self.subTest(method=method, url=url):
+            response, found = self.problems(method, url, data)
+            self.assertEqual(found, [])
+        return response
+
+    def test_pages(self):
+        post_args = [self.author.username, self.post.pk]
+        feeds = [
+            reverse('index'),
+            reverse('group_posts', args=[self.group.slug]),
+            reverse('profile', args=[self.author.username]),
+            reverse('follow_index'),
+        ]
+        for url in feeds:
+            response = self.assertIndexed('get', url)
+            cursor = response.context['page'].next_cursor
+            self.assertIsNotNone(cursor)
+            self.assertIndexed('get', url, {'cursor': cursor})
+            self.assertIndexed('get', url, {'page': 2})
+        response = self.assertIndexed('get', reverse('post', args=post_args))
+        self.assertIndexed(
+            'get', reverse('post_comments', args=post_args),
+            {'cursor': response.context['comments'].next_cursor})
+        self.assertIndexed('get', reverse('search'), {'q': 'текст'})
+        self.assertIndexed('get', reverse('new_post'))
+        self.assertIndexed('post', reverse('new_post'), {'text': 'Новый'})
+        self.assertIndexed(
+            'post', reverse('add_comment', args=post_args), {'text': 'Да'})
+        self.client.force_login(self.author)
+        self.assertIndexed('get', reverse('edit', args=post_args))
+        self.assertIndexed(
+            'post', reverse('edit', args=post_args), {'text': 'Правка'})
+        self.client.force_login(self.user)
+        for name in ('profile_unfollow', 'profile_follow'):
+            self.assertIndexed(
+                'get', reverse(name, args=[self.author.username]))
+        names = {pattern.name for pattern in urls.urlpatterns
+                 if pattern.name}
+        self.assertEqual(names - self.visited, set())
+
+    def test_scan_without_index_is_found(self):
+        """Полный просмотр posts_post мимо индекса pub_date не проходит."""
+        feed = PostQuerySet.feed
+
+        def by_pk(queryset):
+            return feed(queryset).order_by('-pk')
+
+        with mock.patch.object(PostQuerySet, 'feed', by_pk):
+            response, found = self.problems(
+                'get', reverse('index'), {'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([plan[0] for sql, plan in found], ['SCAN posts_post'])
+
+    def test_thumbnail_generation(self):
+        """Посты изображения для обновления карточек ищутся по индексу."""
+        name = 'posts/ab/' + 'ab' * 32 + '.gif'
+        Post.objects.filter(pk=self.post.pk).update(image=name)
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with mock.patch.object(thumbnails, 'create'):
+            with connection.execute_wrapper(record):
+                thumbnails.generate(name)
+        queries = [query for query in queries if 'posts_post' in query[0]]
+        self.assertEqual(len(queries), 2)
+        for sql, params in queries:
+            with self.subTest(sql=sql):
+                self.assertEqual(
+                    full_scans(explain(connection, sql, params)), [])
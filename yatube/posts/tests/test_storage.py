@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Post, User
+from ..storage import ContentAddressedStorage
+from .test_views import small_gif
+
+
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.storage = ContentAddressedStorage(location=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые файлы получают одно имя, разные — разные."""
+        first = self.storage.save('posts/cat.gif', ContentFile(small_gif))
+        second = self.storage.save('posts/meme.GIF', ContentFile(small_gif))
+        other = self.storage.save('posts/cat.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(self.storage.is_hashed(first))
+        self.assertEqual(
+            sorted(os.listdir(self.storage.path('posts'))),
+            sorted([first.split('/')[1], other.split('/')[1]]))
+
+    def test_dedupe_images_command(self):
+        """Команда переносит старые файлы в хранилище по хэшу."""
+        old = FileSystemStorage(location=self.directory)
+        user = User.objects.create_user(username='TestUser')
+        names = [old.save(f'posts/{name}.gif', ContentFile(small_gif))
+                 for name in ('first', 'second')]
+        for name in names * 3:
+            Post.objects.create(text=name, author=user, image=name)
+        field = Post._meta.get_field('image')
+        storage, field.storage = field.storage, self.storage
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                call_command('dedupe_images', stdout=open(os.devnull, 'w'))
+        finally:
+            field.storage = storage
+        # Посты читаются один раз и обновляются запросом на файл.
+        posts_queries = [query['sql'] for query in queries
+                         if 'posts_post' in query['sql']]
+        self.assertEqual(len(posts_queries), 1 + len(names))
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        self.assertTrue(self.storage.is_hashed(images.pop()))
+        for name in names:
+            self.assertFalse(old.exists(name))
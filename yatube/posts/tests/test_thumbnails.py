@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Post, User
+from .test_views import small_gif
+
+
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой', author=cls.user,
+            image=SimpleUploadedFile(
+                name='small.gif', content=small_gif, content_type='image/gif'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_generate_creates_all_sizes(self):
+        """generate() создаёт миниатюры и обновляет дату изменения поста."""
+        self.assertIsNone(thumbnails.lookup(self.post.image, 'card'))
+        thumbnails.generate(self.post.image.name)
+        for size in thumbnails.SIZES:
+            with self.subTest(size=size):
+                self.assertIsNotNone(
+                    thumbnails.lookup(self.post.image, size))
+        updated = Post.objects.get(pk=self.post.pk).updated
+        self.assertGreater(updated, self.post.updated)
+
+    def test_page_does_not_render_images(self):
+        """Страница не открывает изображения и показывает миниатюру."""
+        thumbnails.generate(self.post.image.name)
+        thumbnail = thumbnails.lookup(self.post.image, 'card')
+        with mock.patch('PIL.Image.open') as image_open:
+            response = Client().get(reverse('index'))
+        image_open.assert_not_called()
+        self.assertContains(response, thumbnail.url)
+
+    def test_missing_thumbnail_is_scheduled(self):
+        """Без миниатюры виден оригинал, а миниатюра ставится в очередь."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = Client().get(reverse('index'))
+        schedule.assert_called_with(self.post.image.name)
+        self.assertContains(response, self.post.image.url)
+
+    def test_existing_thumbnail_is_not_regenerated(self):
+        """Для готовых миниатюр generate() не трогает посты."""
+        thumbnails.generate(self.post.image.name)
+        updated = Post.objects.get(pk=self.post.pk).updated
+        with mock.patch.object(thumbnails, 'create') as create:
+            with self.assertNumQueries(0):
+                thumbnails.generate(self.post.image.name)
+        create.assert_not_called()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+
+    def test_generate_updates_posts_sharing_image(self):
+        """Все посты с общим изображением обновляются одним запросом."""
+        other = Post.objects.create(
+            text='Та же картинка', author=self.user,
+            image=self.post.image.name)
+        # Поиск миниатюры, авторы и группы постов, обновление постов.
+        with mock.patch.object(thumbnails, 'create') as create:
+            with self.assertNumQueries(3):
+                thumbnails.generate(self.post.image.name)
+        create.assert_called_once()
+        for post in (self.post, other):
+            with self.subTest(post=post.text):
+                self.assertGreater(
+                    Post.objects.get(pk=post.pk).updated, post.updated)
+
+    def test_edit_without_new_image_is_not_scheduled(self):
+        """Правка текста не ставит миниатюры в очередь."""
+        client = Client()
+        client.force_login(self.user)
+        url = reverse('edit', kwargs={
+            'username': self.user.username, 'post_id': self.post.pk})
+        with mock.patch('posts.views.schedule') as schedule:
+            client.post(url, {'text': 'Новый текст'})
+        schedule.assert_not_called()
+        with mock.patch('posts.views.schedule') as schedule:
+            client.post(url, {'text': 'Новый текст', 'image': (
+                SimpleUploadedFile(
+                    'other.gif', small_gif + b'1', content_type='image/gif'))})
+        schedule.assert_called_once()
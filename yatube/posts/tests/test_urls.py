@@ -1,9 +1,19 @@
+import shutil
+import tempfile
 from http import HTTPStatus
+from unittest import mock
 
+from django.conf import settings
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
 
-from ..models import Group, Post, User
+from core.queries import QueryBudgetExceeded
+
+from .. import urls, views
+from ..models import Comment, Group, Post, User
+from .test_views import small_gif
 
 
 class PostsURLTests(TestCase):
@@ -108,3 +118,71 @@ class PostsURLTests(TestCase):
             with self.subTest(adress=adress):
                 response = self.authorized_author_client.get(adress)
                 self.assertTemplateUsed(response, template)
+
+
+class QueryBudgetURLTests(TestCase):
+    def test_views_declare_query_budget(self):
+        """У каждой страницы posts объявлен бюджет SQL-запросов."""
+        for pattern in urls.urlpatterns:
+            with self.subTest(name=pattern.name):
+                self.assertTrue(hasattr(pattern.callback, 'query_budget'))
+
+    @override_settings(QUERY_BUDGETS='raise', THUMBNAIL_WORKERS=0)
+    def test_pages_fit_budgets_with_images(self):
+        """
+        Страницы с полными лентами постов с картинками укладываются
+        в бюджет при пустом кэше — и по курсору, и по номеру страницы.
+        """
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        reader = User.objects.create_user(username='Reader')
+        author = User.objects.create_user(username='Author')
+        group = Group.objects.create(title='Группа', slug='group')
+        reader.follower.create(author=author)
+        with override_settings(MEDIA_ROOT=media):
+            for number in range(int(settings.POSTS_LIMIT) + 1):
+                post = Post.objects.create(
+                    text=f'Кот {number}', author=author, group=group,
+                    image=SimpleUploadedFile(
+                        'small.gif', small_gif + bytes([number]),
+                        content_type='image/gif'))
+            for number in range(settings.COMMENTS_LIMIT + 1):
+                Comment.objects.create(
+                    post=post, author=reader, text=f'Ответ {number}')
+            kwargs = {'username': author.username, 'post_id': post.pk,
+                      'slug': group.slug}
+            for pattern in urls.urlpatterns:
+                # add_comment — обработчик формы, своей страницы у него нет.
+                if pattern.name in (None, 'add_comment'):
+                    continue
+                url = reverse(pattern.name, kwargs={
+                    key: kwargs[key] for key in pattern.pattern.converters})
+                self.client.force_login(
+                    author if pattern.name == 'edit' else reader)
+                for data in ({}, {'page': 2}):
+                    with self.subTest(name=pattern.name, **data):
+                        cache.clear()
+                        self.client.get(url, {'q': 'кот', **data})
+
+    def unfollow_over_budget(self):
+        author = User.objects.create_user(username='Author')
+        user = User.objects.create_user(username='TestUser')
+        user.follower.create(author=author)
+        self.client.force_login(user)
+        with mock.patch.object(views.profile_unfollow, 'query_budget', 1):
+            return self.client.get(f'/{author.username}/unfollow/')
+
+    @override_settings(QUERY_BUDGETS='raise')
+    def test_view_over_budget_raises(self):
+        """Страница сверх своего бюджета проваливает запрос."""
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'profile_unfollow'):
+            self.unfollow_over_budget()
+
+    @override_settings(QUERY_BUDGETS='log')
+    def test_view_over_budget_is_logged(self):
+        """В режиме 'log' превышение пишется в журнал, ответ уходит."""
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            response = self.unfollow_over_budget()
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertIn('profile_unfollow', logs.output[0])
+        self.assertIn('запросов при бюджете 1', logs.output[0])
@@ -1,14 +1,20 @@
+import base64
+import hashlib
+import json
 import shutil
 import tempfile
+import time
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post, User
+from .. import caching, following
+from ..models import Comment, Follow, Group, Post, Timeline, User
 
 small_gif = (
     b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x80\x00\x00'
@@ -140,6 +146,180 @@ class PostsPagesTests(TestCase):
         post_text3 = response.context['page'][0]
         self.assertNotEqual(post_text3, post_text1)
 
+    def test_feed_cache_is_reset_by_changes(self):
+        """Кэш лент живёт до изменения постов, комментариев и подписок."""
+        urls = [
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user}),
+        ]
+        changes = [
+            lambda: Post.objects.create(
+                text='Новый пост', author=self.user, group=self.group),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='Комментарий'),
+        ]
+        for url in urls:
+            for change in changes:
+                with self.subTest(url=url):
+                    cache.clear()
+                    self.client.get(url)
+                    self.assertNotIn('page', self.client.get(url).context)
+                    change()
+                    self.assertIn('page', self.client.get(url).context)
+
+    def test_follow_resets_profile_cache(self):
+        """Подписка сбрасывает кэш профиля автора."""
+        user2 = User.objects.create_user(username='TestUser2')
+        Post.objects.create(text='Тестовый текст', author=user2)
+        url = reverse('profile', kwargs={'username': user2})
+        self.authorized_client.get(url)
+        self.authorized_client.get(reverse(
+            'profile_follow', kwargs={'username': user2}))
+        response = self.authorized_client.get(url)
+        self.assertIn('page', response.context)
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, reverse(
+            'profile_unfollow', kwargs={'username': user2}))
+
+    def test_cached_page_is_personalized(self):
+        """Общая закэшированная страница дополняется данными пользователя."""
+        cache.clear()
+        edit_url = reverse(
+            'edit', kwargs={'username': self.user, 'post_id': self.post.id})
+        response = self.client.get(reverse('index'))
+        self.assertNotContains(response, edit_url)
+        response = self.authorized_client.get(reverse('index'))
+        self.assertNotIn('page', response.context)
+        self.assertContains(response, edit_url)
+        self.assertContains(response, reverse('follow_index'))
+        self.assertContains(response, reverse(
+            'profile', kwargs={'username': self.user}))
+
+    def test_post_card_cache_follows_post_changes(self):
+        """Карточка поста перестраивается при правке и новом комментарии."""
+        url = reverse(
+            'post', kwargs={'username': self.user, 'post_id': self.post.id})
+        self.authorized_client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        self.assertContains(
+            self.authorized_client.get(url), 'Комментариев: 1')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        self.assertContains(
+            self.authorized_client.get(url), 'Исправленный текст')
+
+    def test_post_card_cache_follows_group_and_author_names(self):
+        """Карточка поста показывает новое название группы и имя автора."""
+        self.authorized_client.get(reverse('index'))
+        Group.objects.filter(pk=self.group.pk).update(title='Новое название')
+        User.objects.filter(pk=self.user.pk).update(username='Renamed')
+        caching.bump('index')
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, '#Новое название')
+        self.assertContains(response, '@Renamed')
+
+    def test_group_rename_resets_pages(self):
+        """После переименования группы ленты показывают новое название."""
+        urls = [
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user}),
+        ]
+        for url in urls:
+            self.client.get(url)
+        self.group.title = 'Новое название'
+        self.group.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Новое название')
+
+    def test_group_delete_resets_pages(self):
+        """Удалённая группа пропадает из кэшированных страниц."""
+        group = Group.objects.create(title='Удаляемая', slug='gone')
+        Post.objects.create(text='Пост группы', author=self.user, group=group)
+        group_url = reverse('group_posts', kwargs={'slug': group.slug})
+        profile_url = reverse('profile', kwargs={'username': self.user})
+        for url in (reverse('index'), group_url, profile_url):
+            self.assertContains(self.client.get(url), group_url)
+        group.delete()
+        self.assertEqual(self.client.get(group_url).status_code, 404)
+        for url in (reverse('index'), profile_url):
+            with self.subTest(url=url):
+                self.assertNotContains(self.client.get(url), group_url)
+
+    def test_pages_answer_not_modified(self):
+        """Страница с текущим ETag отдаёт 304 без запросов к данным."""
+        urls = [
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user}),
+            reverse(
+                'post',
+                kwargs={'username': self.user, 'post_id': self.post.id}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                Comment.objects.create(
+                    post=self.post, author=self.user, text='Комментарий')
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_group_rename_changes_etag(self):
+        """После переименования группы прежний ETag не даёт 304."""
+        urls = [
+            reverse('profile', kwargs={'username': self.user}),
+            reverse(
+                'post',
+                kwargs={'username': self.user, 'post_id': self.post.id}),
+        ]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        self.group.title = 'Новое название'
+        self.group.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Новое название')
+
+    def test_etag_expires(self):
+        """ETag без изменений в областях живёт не дольше кэша страниц."""
+        url = reverse('profile', kwargs={'username': self.user})
+        etag = self.client.get(url)['ETag']
+        later = time.time() + settings.FEED_CACHE_TIMEOUT
+        with mock.patch('time.time', return_value=later):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_stale_page_keeps_its_etag(self):
+        """
+        Пока новую страницу строит другой запрос, прежняя отдаётся
+        со своим ETag, и после перестройки клиент получает новую.
+        """
+        url = reverse('group_posts', kwargs={'slug': self.group.slug})
+        etag = self.client.get(url)['ETag']
+        page_key = caching.PAGE_KEY.format(
+            hashlib.md5(url.encode()).hexdigest())
+        cache.add(f'{page_key}:lock', 1)
+        Post.objects.create(
+            text='Пост во время перестройки', author=self.user,
+            group=self.group)
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Пост во время перестройки')
+        self.assertEqual(response['ETag'], etag)
+        cache.delete(f'{page_key}:lock')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Пост во время перестройки')
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_user_subscribe(self):
         user2 = User.objects.create_user(username='TestUser2')
         self.authorized_client.get(reverse(
@@ -180,6 +360,64 @@ class PostsPagesTests(TestCase):
         post_text1 = response.context['page'][0].text
         self.assertNotEqual(post.text, post_text1)
 
+    def test_timeline_follows_subscriptions(self):
+        """Лента подписок заполняется при подписке и публикации."""
+        user2 = User.objects.create_user(username='TestUser2')
+        old_post = Post.objects.create(text='До подписки', author=user2)
+        self.authorized_client.get(reverse(
+            'profile_follow', kwargs={'username': user2}))
+        new_post = Post.objects.create(text='После подписки', author=user2)
+        self.assertEqual(
+            set(Timeline.objects.filter(
+                user=self.user).values_list('post_id', flat=True)),
+            {old_post.pk, new_post.pk})
+        self.authorized_client.get(reverse(
+            'profile_unfollow', kwargs={'username': user2}))
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_large_audience_posts_are_read_from_posts(self):
+        """Посты авторов с большой аудиторией попадают в ленту при чтении."""
+        user2 = User.objects.create_user(username='TestUser2')
+        Follow.objects.create(user=self.user, author=user2)
+        post = Post.objects.create(text='Проверка подписки', author=user2)
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+        response = self.authorized_client.get(reverse('follow_index'))
+        self.assertEqual(response.context['page'][0], post)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_feed_keeps_posts_after_audience_shrinks(self):
+        """
+        Посты, пропущенные при раскладке, пока аудитория автора была
+        большой, остаются в ленте, когда подписчиков стало меньше.
+        """
+        author = User.objects.create_user(username='TestUser2')
+        before = Post.objects.create(text='До роста', author=author)
+        others = [User.objects.create_user(username=f'Reader{number}')
+                  for number in range(2)]
+        for user in others:
+            Follow.objects.create(user=user, author=author)
+        self.authorized_client.get(reverse(
+            'profile_follow', kwargs={'username': author}))
+        during = Post.objects.create(text='Большая аудитория', author=author)
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+        Follow.objects.filter(user__in=others).delete()
+        after = Post.objects.create(text='После спада', author=author)
+        response = self.authorized_client.get(reverse('follow_index'))
+        self.assertEqual(
+            list(response.context['page']), [after, during, before])
+
+    @override_settings(TIMELINE_BACKFILL=2)
+    def test_backfill_takes_latest_posts(self):
+        """При подписке в ленту переносятся только последние посты."""
+        author = User.objects.create_user(username='TestUser2')
+        posts = [Post.objects.create(text=f'Пост {number}', author=author)
+                 for number in range(3)]
+        self.authorized_client.get(reverse(
+            'profile_follow', kwargs={'username': author}))
+        response = self.authorized_client.get(reverse('follow_index'))
+        self.assertEqual(list(response.context['page']), posts[:0:-1])
+
     def test_auth_user_can_comment(self):
         comments_count = Comment.objects.count()
         form_data = {
@@ -244,6 +482,102 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(
                     response.context.get('page').object_list), 2)
 
+    def test_cursor_paginator(self):
+        """Курсор ведёт на более старые и обратно на более новые записи."""
+        url_list = [
+            '/', f'/group/{self.group.slug}/', f'/{self.user}/',
+        ]
+        for first_page in url_list:
+            with self.subTest(first_page=first_page):
+                cache.clear()
+                page = self.client.get(first_page).context['page']
+                self.assertIsNone(page.previous_cursor)
+                self.assertEqual(page[0].text, 'Тестовый пост 11')
+                older = self.client.get(
+                    f'{first_page}?cursor={page.next_cursor}'
+                ).context['page']
+                self.assertEqual(
+                    [post.text for post in older],
+                    ['Тестовый пост 1', 'Тестовый пост 0'])
+                self.assertIsNone(older.next_cursor)
+                newer = self.client.get(
+                    f'{first_page}?cursor={older.previous_cursor}'
+                ).context['page']
+                self.assertEqual(
+                    list(newer.object_list), list(page.object_list))
+                self.assertIsNone(newer.previous_cursor)
+
+    def test_broken_cursor_shows_first_page(self):
+        """Некорректный курсор отдаёт первую страницу."""
+        response = self.client.get('/group/test-slug/?cursor=broken')
+        self.assertEqual(len(response.context['page']), 10)
+
+    def test_cursor_with_wrong_values_shows_first_page(self):
+        """Курсор с неподходящими значениями тоже отдаёт первую страницу."""
+        self.client.force_login(self.user)
+        for values in (['n', 'garbage', 1], ['n', '2021-01-01', 'x'],
+                       ['p', [1], {}]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(values).encode()).decode()
+            for url in ('/', '/group/test-slug/', reverse('follow_index')):
+                with self.subTest(values=values, url=url):
+                    response = self.client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertIsNone(response.context['page'].previous_cursor)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.best = Post.objects.create(
+            text='Кот, кот и ещё раз кот', author=cls.user)
+        for number in range(11):
+            Post.objects.create(
+                text=f'Пост {number} про кота и собак', author=cls.user)
+        Post.objects.create(text='Только собаки', author=cls.user)
+
+    def search(self, query, cursor=None):
+        data = {'q': query}
+        if cursor:
+            data['cursor'] = cursor
+        return self.client.get(reverse('search'), data).context['page']
+
+    def test_results_are_ranked_and_paginated(self):
+        """Поиск ранжирует посты и листается курсором с сохранением q."""
+        page = self.search('КОТ')
+        self.assertEqual(page[0], self.best)
+        self.assertEqual(len(page), 10)
+        response = self.client.get(reverse('search'), {'q': 'кот'})
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%82&amp;cursor=')
+        rest = self.search('кот', page.next_cursor)
+        self.assertEqual(len(rest), 2)
+        self.assertFalse(set(page) & set(rest))
+
+    def test_results_are_paginated_by_number(self):
+        """Поиск листается и по номеру страницы."""
+        response = self.client.get(reverse('search'), {'q': 'кот', 'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page'].paginator.count, 12)
+        self.assertEqual(len(response.context['page']), 2)
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.get(pk=self.best.pk)
+        post.text = 'Жираф'
+        post.save()
+        self.assertEqual(list(self.search('жираф')), [post])
+        self.assertNotIn(post, self.search('кот'))
+        post.delete()
+        self.assertEqual(len(self.search('жираф')), 0)
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 в строке поиска не ломают страницу."""
+        for query in ('"кот', 'кот AND', 'NEAR(', '', '***'):
+            with self.subTest(query=query):
+                response = self.client.get(reverse('search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+
 
 class NewPostCreateTest(TestCase):
     @classmethod
@@ -276,3 +610,130 @@ class NewPostCreateTest(TestCase):
                 self.assertEqual(post_text_0, self.post.text)
                 self.assertEqual(post_author_0, self.user)
                 self.assertEqual(post_group_0, self.group)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Заголовок',
+            slug='test-slug',
+            description='Тестовое описание группы')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_posts(self, count, images=False):
+        for number in range(count):
+            # У каждого поста своё изображение: хранилище по хэшу
+            # сводит одинаковые файлы в один.
+            image = SimpleUploadedFile(
+                name='small.gif', content=small_gif + bytes([number]),
+                content_type='image/gif') if images else None
+            post = Post.objects.create(
+                text=f'Тестовый пост {number}',
+                author=self.author, group=self.group, image=image)
+            Comment.objects.create(
+                post=post, author=self.user, text='Комментарий')
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        feeds = {
+            reverse('index'): 3,
+            reverse('group_posts', kwargs={'slug': self.group.slug}): 4,
+            reverse('profile', kwargs={'username': self.author}): 5,
+            # С пустым кэшем ещё и запрос подписок пользователя.
+            reverse('follow_index'): 5,
+        }
+        for posts_count in (1, 9):
+            self.create_posts(posts_count)
+            for url, queries in feeds.items():
+                with self.subTest(url=url, posts_count=posts_count):
+                    cache.clear()
+                    with self.assertNumQueries(queries):
+                        self.authorized_client.get(url)
+
+    def test_image_feed_query_count_does_not_depend_on_page_size(self):
+        """Миниатюры всех карточек страницы ищутся одним запросом."""
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        feeds = {
+            reverse('index'): 4,
+            reverse('group_posts', kwargs={'slug': self.group.slug}): 5,
+            reverse('profile', kwargs={'username': self.author}): 6,
+            reverse('follow_index'): 6,
+        }
+        with override_settings(MEDIA_ROOT=media):
+            for posts_count in (1, 9):
+                self.create_posts(posts_count, images=True)
+                for url, queries in feeds.items():
+                    with self.subTest(url=url, posts_count=posts_count):
+                        cache.clear()
+                        with self.assertNumQueries(queries):
+                            self.authorized_client.get(url)
+
+    def test_follow_checks_use_cached_ids(self):
+        """Подписки берутся из кэша, пока пользователь их не изменит."""
+        profile = reverse('profile', kwargs={'username': self.author})
+        follow_index = reverse('follow_index')
+        self.create_posts(1)
+        cache.clear()
+        self.authorized_client.get(follow_index)
+        with self.assertNumQueries(4):
+            self.authorized_client.get(follow_index)
+        with self.assertNumQueries(4):
+            response = self.authorized_client.get(profile)
+        self.assertContains(response, 'Отписаться')
+        self.authorized_client.get(
+            reverse('profile_unfollow', kwargs={'username': self.author}))
+        self.assertContains(self.authorized_client.get(profile), 'Подписаться')
+        response = self.authorized_client.get(follow_index)
+        self.assertEqual(len(response.context['page']), 0)
+
+    def test_following_cache_ignores_sets_read_before_change(self):
+        """
+        Множество подписок, прочитанное до подписки и сохранённое после
+        неё, не подменяет новое.
+        """
+        author = User.objects.create_user(username='Author2')
+        generation, = caching.generations(
+            [following.FOLLOWING_SCOPE.format(self.user.pk)])
+        key = following.FOLLOWING_KEY.format(self.user.pk, generation)
+        stale = following.followed_ids(self.user.pk)
+        cache.delete(key)
+        Follow.objects.create(user=self.user, author=author)
+        cache.add(key, stale)
+        self.assertIn(author.pk, following.followed_ids(self.user.pk))
+
+    @override_settings(COMMENTS_LIMIT=5)
+    def test_comments_are_loaded_in_chunks(self):
+        """Пост выводит первую порцию комментариев, остальные подгружаются."""
+        post = Post.objects.create(text='Популярный пост', author=self.author)
+        for number in range(12):
+            Comment.objects.create(
+                post=post, author=self.user, text=f'Комментарий {number}')
+        kwargs = {'username': self.author.username, 'post_id': post.id}
+        cache.clear()
+        self.authorized_client.get(reverse('post', kwargs=kwargs))
+        with self.assertNumQueries(4):
+            response = self.authorized_client.get(
+                reverse('post', kwargs=kwargs))
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий {number}' for number in range(11, 6, -1)])
+        texts = []
+        cursor = comments.next_cursor
+        while cursor:
+            response = self.authorized_client.get(
+                reverse('post_comments', kwargs=kwargs), {'cursor': cursor})
+            self.assertTemplateUsed(response, 'includes/comment_list.html')
+            texts += [comment.text for comment in response.context['comments']]
+            cursor = response.context['comments'].next_cursor
+        self.assertEqual(
+            texts, [f'Комментарий {number}' for number in range(6, -1, -1)])
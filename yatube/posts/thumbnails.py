@@ -0,0 +1,179 @@
+"""
+Миниатюры изображений постов.
+
+Все миниатюры создаются заранее, в фоновых потоках после сохранения
+поста, поэтому при отрисовке страницы PIL не используется: шаблоны
+только ищут готовую миниатюру в хранилище ключей sorl-thumbnail.
+Записи для всей страницы читаются заранее одним запросом (prefetch),
+и поиск миниатюры каждой карточки обходится кэшем.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.queries import unrecorded
+from core.tracing import span
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import caching
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Все размеры миниатюр, которые используют шаблоны.
+SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+_executor = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+class LookupBackend(ThumbnailBackend):
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры, который создал бы get_thumbnail()."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None. Изображение не открывается."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options))
+
+
+backend = LookupBackend()
+
+
+def lookup(image, size):
+    geometry, options = SIZES[size]
+    with span('thumbnail', size=size):
+        return backend.lookup(image, geometry, **options)
+
+
+def prefetch(images, size):
+    """
+    Загружает в кэш sorl-thumbnail записи миниатюр всех изображений
+    одним запросом. Отсутствующие миниатюры кэшируются как пустые,
+    так же как это делает сам KVStore, и lookup() не ходит в базу.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, KVStore):
+        return
+    geometry, options = SIZES[size]
+    keys = {
+        add_prefix(backend.thumbnail_file(image, geometry, **options).key)
+        for image in images if image}
+    if not keys:
+        return
+    found = kvstore.cache.get_many(keys)
+    missing = keys - found.keys()
+    if not missing:
+        return
+    values = dict(KVStoreModel.objects.filter(
+        key__in=missing).values_list('key', 'value'))
+    kvstore.cache.set_many(
+        {key: values.get(key, EMPTY_VALUE) for key in missing},
+        thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+
+
+def create(image):
+    """Создаёт миниатюры изображения всех размеров."""
+    for geometry, options in SIZES.values():
+        get_thumbnail(image, geometry, **options)
+
+
+def generate(name):
+    """
+    Создаёт миниатюры изображения, если их ещё нет, и обновляет
+    карточки всех постов с этим изображением.
+    """
+    image = Post(image=name).image
+    if all(lookup(image, size) is not None for size in SIZES):
+        return
+    posts = Post.objects.filter(image=name)
+    feeds = list(posts.order_by().values_list(
+        'author__username', 'group__slug').distinct())
+    if not feeds:
+        return
+    create(image)
+    # Карточки кэшируются по времени изменения поста, и без этого
+    # в них надолго останется исходное изображение. update() не вызывает
+    # сигналы, поэтому ленты постов сбрасываются здесь.
+    posts.update(updated=timezone.now())
+    scopes = {'index'}
+    for username, slug in feeds:
+        scopes.add(f'profile:{username}')
+        if slug:
+            scopes.add(f'group:{slug}')
+    caching.bump(*scopes)
+
+
+def _generate_safely(name):
+    # Ошибка в миниатюре не должна ронять ни запрос, ни поток.
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+
+
+def _generate_in_background(name):
+    try:
+        _generate_safely(name)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _pending_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def schedule(name):
+    """
+    Ставит создание миниатюр в очередь после фиксации транзакции.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры создаются сразу, в том же потоке,
+    но их запросы не входят в бюджет view: обычно это работа фонового
+    потока.
+    """
+    def submit():
+        if not settings.THUMBNAIL_WORKERS:
+            with unrecorded():
+                _generate_safely(name)
+            return
+        with _pending_lock:
+            if name in _pending:
+                return
+            _pending.add(name)
+        get_executor().submit(_generate_in_background, name)
+
+    if name:
+        transaction.on_commit(submit)
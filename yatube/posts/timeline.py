@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db.models import F, Q
+
+from .following import followed_ids
+from .models import Follow, Post, Timeline, UserStats
+
+
+def skip_fan_out(author_id):
+    """
+    True, если у автора большая аудитория и его посты не раскладываются
+    по лентам. Тогда автор помечается как fan_out_incomplete: ленты его
+    подписчиков неполны и после того, как подписчиков станет меньше.
+    """
+    return bool(UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).update(fan_out_incomplete=True))
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if skip_fan_out(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=1000, ignore_conflicts=True)
+
+
+def backfill(follow):
+    """
+    Переносит в ленту подписчика последние TIMELINE_BACKFILL постов
+    автора. Более ранние посты в ленту подписок не попадают, они есть
+    только в профиле автора.
+    """
+    if skip_fan_out(follow.author_id):
+        return
+    posts = Post.objects.filter(author_id=follow.author_id).order_by(
+        '-pub_date').values_list('pk', 'pub_date')
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=follow.user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts[:settings.TIMELINE_BACKFILL]),
+        batch_size=1000, ignore_conflicts=True)
+
+
+def prune(follow):
+    Timeline.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id).delete()
+
+
+def follow_feed(user):
+    """
+    Лента подписок и параметры курсора для неё.
+
+    Обычно это один проход по индексу ленты пользователя. Посты авторов,
+    у которых раскладка хоть раз пропускалась из-за большой аудитории
+    (fan_out_incomplete), добираются при чтении условием author_id IN
+    по индексу автора — и тогда, когда подписчиков снова стало меньше
+    TIMELINE_FANOUT_LIMIT. Подписки берутся из кэша.
+    """
+    posts = Post.objects.feed()
+    large_audience = list(UserStats.objects.filter(
+        user_id__in=followed_ids(user.pk), fan_out_incomplete=True,
+    ).values_list('user_id', flat=True))
+    if large_audience:
+        timeline = Timeline.objects.filter(user=user).values('post_id')
+        return posts.filter(
+            Q(pk__in=timeline) | Q(author_id__in=large_audience)), {}
+    # Сортировка по колонкам ленты, а не поста, совпадает с индексом
+    # timeline_user_feed_idx и в режиме ?page=.
+    posts = posts.filter(timeline__user=user).annotate(
+        timeline_date=F('timeline__pub_date'),
+        timeline_post=F('timeline__post_id')).order_by(
+        '-timeline_date', '-timeline_post')
+    return posts, {'lookups': ('timeline_date', 'timeline_post')}
@@ -1,31 +1,50 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from core.queries import query_budget
+
+from .caching import cache_feed, conditional
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .paginators import CursorPaginator, paginate
+from .thumbnails import schedule
+from .timeline import follow_feed
 
 
-@cache_page(20)
+# Сессия, пользователь, число постов (только при ?page=), посты и
+# миниатюры.
+@query_budget(5)
+@cache_feed('index', 'groups')
 def index(request):
-    post_list = Post.objects.select_related('group')
-    paginator = Paginator(post_list, settings.POSTS_LIMIT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    page = paginate(request, post_list)
     return render(request, 'index.html', {'page': page})
 
 
+# Сессия, пользователь, группа, число постов (только при ?page=),
+# посты и миниатюры.
+@query_budget(6)
+@conditional('group:{slug}', 'groups')
+@cache_feed('group:{slug}', 'groups')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, settings.POSTS_LIMIT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = Post.objects.feed().filter(group=group)
+    page = paginate(request, posts)
     return render(request, 'group.html', {'group': group, 'page': page})
 
 
+# Сессия, пользователь, число найденных постов (только при ?page=),
+# посты и миниатюры.
+@query_budget(5)
+def search(request):
+    query = request.GET.get('q', '')
+    posts = Post.objects.feed().search(query)
+    page = paginate(request, posts, keys=('score', 'pk'))
+    return render(request, 'search.html', {'page': page, 'query': query})
+
+
+@query_budget(11)
 @login_required
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -33,10 +52,12 @@ def new_post(request):
         post = form.save(commit=False)
         post.author_id = request.user.id
         post.save()
+        schedule(post.image.name)
         return redirect('index')
     return render(request, 'new.html', {'form': form, 'statement': 'new'})
 
 
+@query_budget(8)
 @login_required
 def post_edit(request, username, post_id):
     post = get_object_or_404(
@@ -46,12 +67,15 @@ def post_edit(request, username, post_id):
     form = PostForm(
         request.POST or None, files=request.FILES or None, instance=post)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            schedule(post.image.name)
         return redirect('post', username=username, post_id=post_id)
     return render(
         request, 'new.html', {'form': form, 'post': post, 'statement': 'edit'})
 
 
+@query_budget(6)
 @login_required
 def add_comment(request, username, post_id):
     post = get_object_or_404(
@@ -67,39 +91,66 @@ def add_comment(request, username, post_id):
     return render(request, 'includes/comments.html', {'form': form})
 
 
+# Сессия, пользователь, автор, число постов (только при ?page=),
+# посты, миниатюры и подписки читателя (если их нет в кэше).
+@query_budget(7)
+@conditional('profile:{username}', 'groups')
+@cache_feed('profile:{username}', 'groups')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    user = request.user
-    post = author.posts.all()
-    paginator = Paginator(post, settings.POSTS_LIMIT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = user.is_authenticated and (
-        Follow.objects.filter(user=user, author=author).exists())
-    return render(
-        request,
-        'profile.html',
-        {'page': page, 'author': author, 'following': following})
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    post = Post.objects.feed().filter(author=author)
+    page = paginate(request, post)
+    return render(request, 'profile.html', {'page': page, 'author': author})
 
 
+def comments_page(post, cursor):
+    paginator = CursorPaginator(
+        post.comments.select_related('author'), settings.COMMENTS_LIMIT,
+        keys=('created', 'pk'))
+    return paginator.get_cursor_page(cursor)
+
+
+@query_budget(5)
+@conditional('profile:{username}', 'groups')
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.feed().select_related('author__stats'),
+        id=post_id, author__username=username)
     form = CommentForm()
     return render(request, 'post.html', {
-        'post': post, 'comments': comments, 'form': form})
+        'post': post, 'author': post.author,
+        'comments': comments_page(post, request.GET.get('cursor')),
+        'form': form})
 
 
+@query_budget(2)
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев поста HTML-фрагментом."""
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        id=post_id, author__username=username)
+    return render(request, 'includes/comment_list.html', {
+        'post': post,
+        'comments': comments_page(post, request.GET.get('cursor'))})
+
+
+# Сессия, пользователь, подписки (если их нет в кэше), авторы с
+# неполной раскладкой, число постов (только при ?page=), посты и
+# миниатюры.
+@query_budget(7)
 @login_required
 def follow_index(request):
-    user = request.user
-    post_list = Post.objects.filter(author__following__user=user)
-    paginator = Paginator(post_list, settings.POSTS_LIMIT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list, cursor_keys = follow_feed(request.user)
+    page = paginate(request, post_list, **cursor_keys)
     return render(request, 'follow.html', {'page': page})
 
 
+# Сессия, пользователь, автор, get_or_create подписки (выборка и
+# вставка с точкой сохранения или транзакцией) и сигналы: два счётчика,
+# отметка неполной раскладки, последние посты автора и их вставка в
+# ленту, имена для сброса кэша профилей.
+@query_budget(13)
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
@@ -110,6 +161,10 @@ def profile_follow(request, username):
     return redirect('profile', username=username)
 
 
+# Сессия, пользователь, автор, выборка подписки, начало транзакции и
+# удаление, два счётчика, чистка ленты и имена для сброса кэша
+# профилей.
+@query_budget(10)
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
@@ -120,6 +175,7 @@ def profile_unfollow(request, username):
     return redirect('profile', username=username)
 
 
+@query_budget(2)
 def page_not_found(request, exception=None):
     # Переменная exception содержит отладочную информацию,
     # выводить её в шаблон пользователской страницы 404 мы не станем
@@ -131,5 +187,6 @@ def page_not_found(request, exception=None):
     )
 
 
+@query_budget(2)
 def server_error(request):
     return render(request, "misc/500.html", status=500)
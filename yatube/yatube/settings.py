@@ -1,5 +1,6 @@
 
 import os
+import tempfile
 
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -21,6 +22,8 @@ INSTALLED_APPS = [
     'about.apps.AboutConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -31,13 +34,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.tracing.TracingMiddleware',
+    'core.queries.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'posts.holes.HoleFillingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.tracing.ViewTracingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -45,7 +54,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -113,9 +122,75 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 POSTS_LIMIT = '10'
+# Сколько комментариев выводится под постом и подгружается за раз.
+COMMENTS_LIMIT = 20
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
     }
 }
+
+TEST_RUNNER = 'core.test_runner.CacheClearingRunner'
+
+# Посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам подписчиков при публикации, а выбираются при чтении ленты.
+TIMELINE_FANOUT_LIMIT = 10000
+# Сколько последних постов автора переносится в ленту при подписке;
+# более ранние посты в ленте подписок не появятся.
+TIMELINE_BACKFILL = 500
+
+# Сколько хранятся страницы лент: они сбрасываются при изменении постов,
+# комментариев, подписок и групп, так что срок нужен лишь для вытеснения.
+FEED_CACHE_TIMEOUT = 60 * 10
+# Сколько хранятся множества подписок пользователей; они тоже
+# сбрасываются при подписке и отписке.
+FOLLOWING_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько потоков создают миниатюры загруженных изображений;
+# 0 — создавать их сразу, в потоке запроса.
+THUMBNAIL_WORKERS = 2
+
+# Проверка числа SQL-запросов view: 'log' пишет нарушения в журнал,
+# 'raise' бросает исключение (так в тестах), None отключает проверку.
+QUERY_BUDGETS = 'log' if DEBUG else None
+# Сколько раз запрос одной формы может повториться за запрос к сайту.
+QUERY_REPEAT_LIMIT = 3
+
+# Каталог, где процессы сохраняют свои метрики для /metrics; None
+# отключает сбор метрик. Сохраняются они раз в METRICS_FLUSH_INTERVAL
+# секунд, а /metrics открыт только адресам из INTERNAL_IPS.
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube-metrics')
+METRICS_FLUSH_INTERVAL = 5
+INTERNAL_IPS = ['127.0.0.1']
+
+# Профилирование запросов по требованию: стеки снимаются раз в
+# PROFILING_INTERVAL секунд и сохраняются в PROFILING_DIR, триггеры
+# из админки перечитываются раз в PROFILING_REFRESH секунд.
+PROFILING_DIR = os.path.join(tempfile.gettempdir(), 'yatube-profiles')
+PROFILING_INTERVAL = 0.005
+PROFILING_REFRESH = 5
+
+# Трассы запросов дольше TRACING_SLOW секунд и с ошибкой 5xx пишутся
+# в TRACING_FILE; при TRACING_MAX_BYTES файл ротируется, хранится
+# TRACING_BACKUPS старых копий. None отключает трассировку.
+TRACING_FILE = os.path.join(
+    tempfile.gettempdir(), 'yatube-traces', 'traces.jsonl')
+TRACING_SLOW = 1.0
+TRACING_MAX_BYTES = 10 * 1024 * 1024
+TRACING_BACKUPS = 3
+
+# SQL-запросы дольше SLOW_QUERY_THRESHOLD секунд пишутся с планом
+# выполнения в SLOW_QUERY_LOG (ротация как у трасс); полный просмотр
+# таблиц из SLOW_QUERY_TABLES ещё и в журнал core.slow_queries.
+# None в SLOW_QUERY_LOG или SLOW_QUERY_THRESHOLD отключает журнал.
+SLOW_QUERY_LOG = os.path.join(
+    tempfile.gettempdir(), 'yatube-slow-queries', 'slow.jsonl')
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_TABLES = ['posts_post', 'posts_comment', 'posts_follow']
+SLOW_QUERY_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_BACKUPS = 3